@@ -1,3 +1,5 @@
 from .agents import MinimaxABAgent, NegascoutAgent, CompetitiveAgent
+from .solver import Solver, solve
+from .transposition import TranspositionTable
 
-__all__ = ["MinimaxABAgent", "NegascoutAgent", "CompetitiveAgent"]
+__all__ = ["MinimaxABAgent", "NegascoutAgent", "CompetitiveAgent", "Solver", "solve", "TranspositionTable"]
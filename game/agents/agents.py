@@ -1,16 +1,256 @@
 import random
+import time
+from game.models.config import SOLVER_EMPTY_CELLS, PARALLEL_WORKERS
+from game.models.geometry import DEFAULT_GEOMETRY
 from game.models.state import State
+from game.agents.transposition import TranspositionTable
+from game.agents.book import get_opening_book
+from game.agents.parallel import get_parallel_search, use_parallel_search
+from game.agents.solver import Solver
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the deadline of an iterative deepening run has passed.
+    """
+    pass
+
 
 class Agent:
     ident = 0
+    DEADLINE_CHECK_MASK = 255  # Check the clock every 256 nodes
+    HEURISTICS = ("easy", "medium", "hard")
 
-    def __init__(self):
+    def __init__(self, tt=None, heuristic=None):
         self.id = Agent.ident
         Agent.ident += 1
+        # Without an explicit tier, the first agents created get the easier heuristics
+        self.heuristic = heuristic if heuristic is not None else Agent.HEURISTICS[min(self.id, 2)]
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.deadline = None
+        self.stop_check = None
+        self.nodes = 0
+        self.stats = None
+        # Move ordering: two killer columns per ply and a history score per player and cell,
+        # sized for the geometry of the searched states
+        self.ordering_geometry = None
+        self.killers = None
+        self.history = None
+
+    def get_chosen_column(self, state, max_depth=None, time_ms=None):
+        """
+        Searches to a fixed depth, or iteratively deepens within time_ms milliseconds
+        (capped at max_depth if both are given).
+        """
+        self.start_search(state)
+        if time_ms is None:
+            _, column = self.search_depth(state, max_depth)
+            return column
+        return self.iterative_deepening(state, time_ms, max_depth)
 
-    def get_chosen_column(self, state, max_depth):
+    def search(self, state, depth, first_column=None):
         pass
 
+    def search_depth(self, state, depth, first_column=None):
+        """
+        Runs search() and records the nodes and time of the depth when stats are collected.
+        """
+        if self.stats is None:
+            return self.search(state, depth, first_column)
+        nodes_before = self.nodes
+        start_time = time.perf_counter()
+        result = self.search(state, depth, first_column)
+        self.stats.record_depth(depth, self.nodes - nodes_before, time.perf_counter() - start_time)
+        return result
+
+    def iterative_deepening(self, state, time_ms, max_depth=None):
+        """
+        Searches depth 1, 2, 3... with the previous best move ordered first and returns
+        the best move of the deepest iteration that completed before the deadline.
+        """
+        empty_cells = state.geometry.size - state.get_int_state().bit_count()
+        depth_limit = empty_cells if max_depth is None else min(max_depth, empty_cells)
+        # Depth 1 always completes so there is a move to return
+        _, best_column = self.search_depth(state, 1)
+        self.set_deadline(time.perf_counter() + time_ms / 1000)
+        try:
+            for depth in range(2, depth_limit + 1):
+                _, best_column = self.search_depth(state, depth, best_column)
+        except SearchTimeout:
+            pass
+        finally:
+            self.set_deadline(None)
+        return best_column
+
+    def get_exact_column(self, state):
+        """
+        Returns (column, source) for positions decided without the heuristic search, see `CompetitiveAgent`.
+        """
+        return None, None
+
+    def analyze(self, state, max_depth=None, time_ms=None):
+        """
+        Scores every possible column by searching the position after it to depth - 1; the column
+        search() would choose has the highest score. With time_ms, deepens until the budget runs out.
+        Returns the scores of the deepest completed depth and that depth.
+        """
+        self.start_search(state)
+        if time_ms is None:
+            return self.analyze_depth(state, max_depth), max_depth
+        empty_cells = state.geometry.size - state.get_int_state().bit_count()
+        depth_limit = empty_cells if max_depth is None else min(max_depth, empty_cells)
+        scores, depth_reached = self.analyze_depth(state, 1), 1
+        self.set_deadline(time.perf_counter() + time_ms / 1000)
+        try:
+            for depth in range(2, depth_limit + 1):
+                scores, depth_reached = self.analyze_depth(state, depth), depth
+        except SearchTimeout:
+            pass
+        finally:
+            self.set_deadline(None)
+        return scores, depth_reached
+
+    def analyze_depth(self, state, depth):
+        state = state.copy()
+        scores = {}
+        for column in state.get_possible_columns():
+            state.make_move(column)
+            scores[column] = self.score_move(state, depth)
+            state.unmake_move()
+        return scores
+
+    def score_move(self, state, depth):
+        """
+        Score of the move that led to the state, as the root of search() to the given depth sees it.
+        """
+        pass
+
+    def set_deadline(self, deadline):
+        self.deadline = deadline
+
+    def set_stop_check(self, stop_check):
+        """
+        Registers a callable that cancels the running search once it returns True.
+        """
+        self.stop_check = stop_check
+
+    def sorted_columns(self, state, first_column=None):
+        """
+        Drops the moves ruled out by the threat checks (see `get_tactical_columns`) and orders the rest:
+        the TT or previous iteration's best column, immediate wins, blocks of the opponent's immediate
+        wins, the killer columns of the ply, then by history score, ties go to the centre.
+        """
+        geometry = state.geometry
+        if geometry is not self.ordering_geometry:
+            self.reset_ordering(geometry)
+        occupied = state.get_int_state()
+        player = state.get_next_on_move()
+        wins = geometry.get_winning_cells(state.get_checkers(player), occupied)
+        threats = geometry.get_winning_cells(state.get_checkers(1 - player), occupied)
+        columns = self.get_tactical_columns(state, wins, threats)
+        killers = self.killers[occupied.bit_count()]
+        history = self.history[player]
+        center_rank = geometry.center_rank
+        rows, column_mask = geometry.rows, geometry.column_mask
+
+        def priority(column):
+            if column == first_column:
+                return 0, 0, 0
+            shift = column * rows
+            cell = ((occupied >> shift) & column_mask) + 1
+            if (wins >> shift) & cell:
+                return 1, 0, center_rank[column]
+            if (threats >> shift) & cell:
+                return 2, 0, center_rank[column]
+            if column == killers[0]:
+                return 3, 0, 0
+            if column == killers[1]:
+                return 4, 0, 0
+            return 5, -history[shift + cell.bit_length() - 1], center_rank[column]
+
+        return sorted(columns, key=priority)
+
+    @staticmethod
+    def get_tactical_columns(state, wins=None, threats=None):
+        """
+        Columns left by the threat checks, see `Geometry.get_tactical_cells`: an immediate win,
+        or the moves that neither ignore an opponent's immediate win nor let the opponent win on top.
+        """
+        geometry = state.geometry
+        occupied = state.get_int_state()
+        if wins is None:
+            player = state.get_next_on_move()
+            wins = geometry.get_winning_cells(state.get_checkers(player), occupied)
+            threats = geometry.get_winning_cells(state.get_checkers(1 - player), occupied)
+        cells = geometry.get_tactical_cells(wins, threats, occupied)
+        rows, column_mask = geometry.rows, geometry.column_mask
+        return tuple(col for col in state.get_possible_columns() if (cells >> (col * rows)) & column_mask)
+
+    def record_cutoff(self, state, column, depth):
+        """
+        Remembers a column that caused a cutoff as a killer of its ply and raises its history score.
+        """
+        occupied = state.get_int_state()
+        killers = self.killers[occupied.bit_count()]
+        if killers[0] != column:
+            killers[1] = killers[0]
+            killers[0] = column
+        rows = state.geometry.rows
+        cell = (((occupied >> (column * rows)) & state.geometry.column_mask) + 1).bit_length() - 1
+        self.history[state.get_next_on_move()][column * rows + cell] += depth * depth
+
+    def clear_tables(self):
+        """
+        Drops the transposition table and the move ordering scores, e.g. before searching another game.
+        """
+        self.tt.clear()
+        self.ordering_geometry = None
+
+    def start_search(self, state):
+        """
+        Ages the move ordering before a new root: history scores are halved, so those of earlier
+        searches (maybe of other games) fade out, and the killers, kept by absolute ply, are cleared.
+        """
+        if state.geometry is not self.ordering_geometry:
+            self.reset_ordering(state.geometry)
+            return
+        for history in self.history:
+            for cell, score in enumerate(history):
+                history[cell] = score >> 1
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+
+    def reset_ordering(self, geometry):
+        self.ordering_geometry = geometry
+        self.killers = [[None, None] for _ in range(geometry.size)]
+        self.history = [[0] * geometry.size for _ in range(2)]
+
+    def set_stats(self, stats):
+        """
+        Registers a `SearchStats` filled in by the following searches, None disables collection.
+        """
+        self.stats = stats
+
+    def check_deadline(self):
+        self.nodes += 1
+        if not self.nodes & Agent.DEADLINE_CHECK_MASK:
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchTimeout()
+            if self.stop_check is not None and self.stop_check():
+                raise SearchTimeout()
+
+    def store(self, key, value, depth, alpha, beta, best_column):
+        """
+        Stores a search result with the bound type implied by the original window.
+        """
+        if value <= alpha:
+            flag = TranspositionTable.UPPER
+        elif value >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self.tt.store(key, value, depth, flag, best_column)
+
     @staticmethod
     def easy_heuristic(state):
         """
@@ -18,7 +258,7 @@ class Agent:
         """
         current_player = state.get_next_on_move()
         opponent = State.YEL if current_player == State.RED else State.RED
-        player_potential = sum(1 for mask in state.win_masks if (mask & state.get_checkers(opponent)) == 0)
+        player_potential = state.get_free_masks(opponent)
         return player_potential
 
     @staticmethod
@@ -28,8 +268,8 @@ class Agent:
         """
         current_player = state.get_next_on_move()
         opponent = State.YEL if current_player == State.RED else State.RED
-        player_potential = sum(1 for mask in state.win_masks if (mask & state.get_checkers(opponent)) == 0)
-        opponent_potential = sum(1 for mask in state.win_masks if (mask & state.get_checkers(current_player)) == 0)
+        player_potential = state.get_free_masks(opponent)
+        opponent_potential = state.get_free_masks(current_player)
         return player_potential - 2 * opponent_potential
 
     @staticmethod
@@ -39,17 +279,9 @@ class Agent:
         """
         current_player = state.get_next_on_move()
         opponent = State.YEL if current_player == State.RED else State.RED
-        player_score = 0
-        opponent_score = 0
-
-        for mask in state.win_masks:
-            player_match = state.get_checkers(current_player) & mask
-            opponent_match = state.get_checkers(opponent) & mask
-
-            if player_match == 0:
-                player_score += 5 - bin(mask).count("1")  # Less tokens = higher score
-            if opponent_match == 0:
-                opponent_score += 5 - bin(mask).count("1")
+        # Every win mask has win_count cells, so each mask free of a player's checkers weighs the same
+        player_score = state.get_free_masks(current_player)
+        opponent_score = state.get_free_masks(opponent)
 
         return player_score - opponent_score
 
@@ -58,41 +290,76 @@ class MinimaxABAgent(Agent):
     Minimax agent with Alpha-Beta pruning.
     """
 
-    def get_chosen_column(self, state, max_depth):
-        _, column = self.minimax(state, max_depth, True, float('-inf'), float('inf'))
-        return column
+    def search(self, state, depth, first_column=None):
+        # Moves are made and unmade in place on a copy, a timeout simply discards it
+        return self.minimax(state.copy(), depth, True, float('-inf'), float('inf'), first_column)
 
-    def minimax(self, state, depth, maximizing_player, alpha, beta):
+    def minimax(self, state, depth, maximizing_player, alpha, beta, first_column=None):
+        self.check_deadline()
         if depth == 0 or state.get_state_status() is not None:
             return self.evaluate(state), None
 
+        key = self.get_tt_key(state, maximizing_player)
+        entry = self.tt.lookup(key)
+        tt_column = None
+        if entry is not None:
+            if self.stats is not None:
+                self.stats.tt_hits += 1
+            _, value, entry_depth, flag, tt_column = entry
+            if entry_depth >= depth:
+                if flag == TranspositionTable.EXACT:
+                    return value, tt_column
+                if flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value, tt_column
+        alpha_orig, beta_orig = alpha, beta
+
         if maximizing_player:
             max_eval = float('-inf')
             best_column = None
-            for column in self.sorted_columns(state):
-                new_state = state.generate_successor_state(column)
-                eval, _ = self.minimax(new_state, depth - 1, False, alpha, beta)
+            for i, column in enumerate(self.sorted_columns(state, tt_column if first_column is None else first_column)):
+                state.make_move(column)
+                eval, _ = self.minimax(state, depth - 1, False, alpha, beta)
+                state.unmake_move()
                 if eval > max_eval:
                     max_eval = eval
                     best_column = column
                 alpha = max(alpha, eval)
                 if beta <= alpha:
+                    self.record_cutoff(state, column, depth)
                     break
+            if self.stats is not None:
+                self.stats.record_node(i + 1, beta <= alpha)
+            self.store(key, max_eval, depth, alpha_orig, beta_orig, best_column)
             return max_eval, best_column
         else:
             min_eval = float('inf')
             best_column = None
-            for column in self.sorted_columns(state):
-                new_state = state.generate_successor_state(column)
-                eval, _ = self.minimax(new_state, depth - 1, True, alpha, beta)
+            for i, column in enumerate(self.sorted_columns(state, tt_column if first_column is None else first_column)):
+                state.make_move(column)
+                eval, _ = self.minimax(state, depth - 1, True, alpha, beta)
+                state.unmake_move()
                 if eval < min_eval:
                     min_eval = eval
                     best_column = column
                 beta = min(beta, eval)
                 if beta <= alpha:
+                    self.record_cutoff(state, column, depth)
                     break
+            if self.stats is not None:
+                self.stats.record_node(i + 1, beta <= alpha)
+            self.store(key, min_eval, depth, alpha_orig, beta_orig, best_column)
             return min_eval, best_column
 
+    def score_move(self, state, depth):
+        return self.minimax(state, depth - 1, False, float('-inf'), float('inf'))[0]
+
+    def get_tt_key(self, state, maximizing_player):
+        return state.checkers_red, state.checkers_yellow, state.next_on_move, maximizing_player
+
     def evaluate(self, state):
         if state.get_state_status() == State.RED:
             return 1000  # Red wins
@@ -100,39 +367,58 @@ class MinimaxABAgent(Agent):
             return -1000  # Yellow wins
 
         # Choose heuristic based on difficulty level
-        if self.id == 0:  # Example: EASY
+        if self.heuristic == "easy":
             return self.easy_heuristic(state)
-        elif self.id == 1:  # Example: MEDIUM
+        elif self.heuristic == "medium":
             return self.medium_heuristic(state)
         else:  # HARD
             return self.hard_heuristic(state)
 
-    def sorted_columns(self, state):
-        columns = state.get_possible_columns()
-        center_order = [3, 2, 4, 1, 5, 0, 6]
-        return sorted(columns, key=lambda col: center_order.index(col))
-
 class NegascoutAgent(Agent):
     """
     Negascout algorithm agent.
     """
 
-    def get_chosen_column(self, state, max_depth):
-        _, column = self.negascout(state, max_depth, True, float('-inf'), float('inf'))
-        return column
+    def search(self, state, depth, first_column=None):
+        # Moves are made and unmade in place on a copy, a timeout simply discards it
+        return self.negascout(state.copy(), depth, True, float('-inf'), float('inf'), first_column)
 
-    def negascout(self, state, depth, maximizing_player, alpha, beta):
+    def negascout(self, state, depth, maximizing_player, alpha, beta, first_column=None):
+        self.check_deadline()
         if depth == 0 or state.get_state_status() is not None:
             return self.evaluate(state), None
 
+        key = self.get_tt_key(state, maximizing_player)
+        entry = self.tt.lookup(key)
+        tt_column = None
+        if entry is not None:
+            if self.stats is not None:
+                self.stats.tt_hits += 1
+            _, value, entry_depth, flag, tt_column = entry
+            if entry_depth >= depth:
+                if flag == TranspositionTable.EXACT:
+                    return value, tt_column
+                if flag == TranspositionTable.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, tt_column
+        alpha_orig = alpha
+
         best_value = float('-inf')
         best_column = None
         b = beta
 
-        for i, column in enumerate(self.sorted_columns(state)):
-            new_state = state.generate_successor_state(column)
-            value, _ = self.negascout(new_state, depth - 1, not maximizing_player, -b, -alpha)
+        for i, column in enumerate(self.sorted_columns(state, tt_column if first_column is None else first_column)):
+            state.make_move(column)
+            value, _ = self.negascout(state, depth - 1, not maximizing_player, -b, -alpha)
             value = -value
+            if i > 0 and alpha < value < beta:
+                # The null window failed high, the exact value needs the full window
+                value, _ = self.negascout(state, depth - 1, not maximizing_player, -beta, -alpha)
+                value = -value
+            state.unmake_move()
 
             if value > best_value:
                 best_value = value
@@ -142,13 +428,24 @@ class NegascoutAgent(Agent):
                 alpha = value
 
             if alpha >= beta:
+                self.record_cutoff(state, column, depth)
                 break
 
             if i > 0:
                 b = alpha + 1
 
+        if self.stats is not None:
+            self.stats.record_node(i + 1, alpha >= beta)
+        self.store(key, best_value, depth, alpha_orig, beta, best_column)
         return best_value, best_column
 
+    def score_move(self, state, depth):
+        return -self.negascout(state, depth - 1, False, float('-inf'), float('inf'))[0]
+
+    def get_tt_key(self, state, maximizing_player):
+        # Negamax values do not depend on the maximizing flag
+        return state.checkers_red, state.checkers_yellow, state.next_on_move
+
     def evaluate(self, state):
         if state.get_state_status() == State.RED:
             return 1000  
@@ -156,32 +453,136 @@ class NegascoutAgent(Agent):
             return -1000  
 
         
-        if self.id == 0:  
+        if self.heuristic == "easy":
             return self.easy_heuristic(state)
-        elif self.id == 1:  
+        elif self.heuristic == "medium":
             return self.medium_heuristic(state)
         else:  
             return self.hard_heuristic(state)
 
-    def sorted_columns(self, state):
-        columns = state.get_possible_columns()
-        center_order = [3, 2, 4, 1, 5, 0, 6]
-        return sorted(columns, key=lambda col: center_order.index(col))
-
 class CompetitiveAgent(Agent):
     """
     Competitive agent for advanced strategies.
     """
 
-    def __init__(self):
-        self.minimax_agent = MinimaxABAgent()
-        self.negascout_agent = NegascoutAgent()
+    def __init__(self, use_book=True, solver_empty_cells=SOLVER_EMPTY_CELLS, heuristic=None, workers=PARALLEL_WORKERS):
+        self.minimax_agent = MinimaxABAgent(heuristic=heuristic)
+        self.negascout_agent = NegascoutAgent(heuristic=heuristic)
+        self.solver = Solver()
+        self.use_book = use_book
+        self.solver_empty_cells = solver_empty_cells
+        self.stats = None
+        # With more than one worker, deep searches split the root moves across processes
+        self.workers = workers
+        self.parallel_nodes = 0
+
+    def get_chosen_column(self, state, max_depth=None, time_ms=None):
+        nodes_before = self.solver.nodes
+        start_time = time.perf_counter()
+        if time_ms is not None:
+            # The solver gets half of the budget, the rest is left for the heuristic search if it runs out
+            self.solver.set_deadline(start_time + time_ms / 2000)
+        try:
+            column, source = self.get_exact_column(state)
+        except SearchTimeout:
+            if self.solver.stop_check is not None and self.solver.stop_check():
+                raise
+            column, source = None, None
+            time_ms = max(time_ms - (time.perf_counter() - start_time) * 1000, 0)
+        finally:
+            self.solver.set_deadline(None)
+        if column is None:
+            return super().get_chosen_column(state, max_depth, time_ms)
+        if self.stats is not None:
+            self.stats.source = source
+            if source == "solver":
+                self.stats.nodes += self.solver.nodes - nodes_before
+                self.stats.depth_reached = state.geometry.size - state.get_int_state().bit_count()
+        return column
 
-    def get_chosen_column(self, state, max_depth):
-        if max_depth % 2 == 0:
-            return self.negascout_agent.get_chosen_column(state, max_depth)
+    def get_exact_column(self, state):
+        """
+        Returns (column, source) when the threat checks, the opening book or the solver decide the position,
+        otherwise (None, None) and the position needs the heuristic search.
+        """
+        # An immediate win, the only block or the only move that does not lose at once needs no search
+        columns = self.get_tactical_columns(state)
+        if len(columns) == 1:
+            return columns[0], "tactics"
+        # The opening book and the solver only know the default board
+        if state.geometry is not DEFAULT_GEOMETRY:
+            return None, None
+        if self.use_book:
+            book = get_opening_book()
+            column = book.lookup(state) if book is not None else None
+            if column is not None and column in state.get_possible_columns():
+                return column, "book"
+        # Near the end of the game an exact solve is both stronger and faster than the heuristic search
+        empty_cells = state.geometry.size - state.get_int_state().bit_count()
+        if empty_cells <= self.solver_empty_cells and state.get_state_status() is None:
+            return self.solver.get_chosen_column(state), "solver"
+        return None, None
+
+    def search(self, state, depth, first_column=None):
+        if depth % 2 == 0:
+            agent, kind = self.negascout_agent, "negascout"
         else:
-            return self.minimax_agent.get_chosen_column(state, max_depth)
+            agent, kind = self.minimax_agent, "minimax"
+        if use_parallel_search(self.workers, depth) and state.get_state_status() is None:
+            value, column, nodes = get_parallel_search(self.workers).search(agent, kind, state, depth, first_column)
+            self.parallel_nodes += nodes
+            return value, column
+        return agent.search(state, depth, first_column)
+
+    def analyze(self, state, max_depth=None, time_ms=None):
+        # Near the end of the game the scores are exact, see `Solver.analyze`
+        empty_cells = state.geometry.size - state.get_int_state().bit_count()
+        if state.geometry is DEFAULT_GEOMETRY and empty_cells <= self.solver_empty_cells \
+                and state.get_state_status() is None:
+            start_time = time.perf_counter()
+            if time_ms is not None:
+                self.solver.set_deadline(start_time + time_ms / 2000)
+            try:
+                return self.solver.analyze(state), empty_cells
+            except SearchTimeout:
+                if self.solver.stop_check is not None and self.solver.stop_check():
+                    raise
+                time_ms = max(time_ms - (time.perf_counter() - start_time) * 1000, 0)
+            finally:
+                self.solver.set_deadline(None)
+        return super().analyze(state, max_depth, time_ms)
+
+    def score_move(self, state, depth):
+        if depth % 2 == 0:
+            return self.negascout_agent.score_move(state, depth)
+        return self.minimax_agent.score_move(state, depth)
+
+    @property
+    def nodes(self):
+        return self.minimax_agent.nodes + self.negascout_agent.nodes + self.solver.nodes + self.parallel_nodes
+
+    def start_search(self, state):
+        self.minimax_agent.start_search(state)
+        self.negascout_agent.start_search(state)
+
+    def clear_tables(self):
+        self.minimax_agent.clear_tables()
+        self.negascout_agent.clear_tables()
+        self.solver.tt.clear()
+
+    def set_deadline(self, deadline):
+        self.minimax_agent.set_deadline(deadline)
+        self.negascout_agent.set_deadline(deadline)
+
+    def set_stop_check(self, stop_check):
+        self.minimax_agent.set_stop_check(stop_check)
+        self.negascout_agent.set_stop_check(stop_check)
+        self.solver.set_stop_check(stop_check)
+
+    def set_stats(self, stats):
+        self.stats = stats
+        self.minimax_agent.set_stats(stats)
+        self.negascout_agent.set_stats(stats)
 
     def evaluate(self, state):
         return self.negascout_agent.evaluate(state)
@@ -0,0 +1,106 @@
+import numpy as np
+
+from game.models.geometry import DEFAULT_GEOMETRY
+from game.models.state import State
+
+# Status code for positions that are still in play (State.get_state_status() returns None)
+NO_STATUS = -1
+
+# Bitboards of the default board fit into uint64
+M = DEFAULT_GEOMETRY.rows
+WIN_MASKS = np.array(sorted(DEFAULT_GEOMETRY.win_masks), dtype=np.uint64)
+DRAW_MASK = np.uint64(DEFAULT_GEOMETRY.draw_mask)
+HEURISTICS = ("easy", "medium", "hard")
+
+
+def as_bitboards(checkers):
+    return np.asarray(checkers, dtype=np.uint64)
+
+
+def get_next_on_move(checkers_red, checkers_yellow):
+    """
+    Derives the player on move from the checker counts (red always moves first).
+    """
+    red_count = np.bitwise_count(as_bitboards(checkers_red))
+    yellow_count = np.bitwise_count(as_bitboards(checkers_yellow))
+    return np.where(red_count > yellow_count, State.YEL, State.RED).astype(np.int8)
+
+
+def get_free_masks(checkers):
+    """
+    Number of win masks without a checker of the player, for every position in the batch.
+    """
+    checkers = as_bitboards(checkers)
+    return ((checkers[:, None] & WIN_MASKS[None, :]) == 0).sum(axis=1, dtype=np.int64)
+
+
+def get_state_statuses(checkers_red, checkers_yellow):
+    """
+    Batched State.get_state_status(): State.RED, State.YEL, State.DRAW or NO_STATUS per position.
+    """
+    checkers_red = as_bitboards(checkers_red)
+    checkers_yellow = as_bitboards(checkers_yellow)
+    red_wins = ((checkers_red[:, None] & WIN_MASKS[None, :]) == WIN_MASKS[None, :]).any(axis=1)
+    yellow_wins = ((checkers_yellow[:, None] & WIN_MASKS[None, :]) == WIN_MASKS[None, :]).any(axis=1)
+    full = (checkers_red | checkers_yellow) == DRAW_MASK
+    statuses = np.full(checkers_red.shape, NO_STATUS, dtype=np.int8)
+    statuses[yellow_wins] = State.YEL
+    statuses[red_wins] = State.RED
+    statuses[full] = State.DRAW
+    return statuses
+
+
+def get_heuristic_scores(checkers_red, checkers_yellow, next_on_move=None, heuristic="hard"):
+    """
+    Batched Agent.easy_heuristic, medium_heuristic or hard_heuristic.
+    """
+    if heuristic not in HEURISTICS:
+        raise ValueError(f'Unknown heuristic {heuristic}!')
+    if next_on_move is None:
+        next_on_move = get_next_on_move(checkers_red, checkers_yellow)
+    red_on_move = np.asarray(next_on_move) == State.RED
+    free_red = get_free_masks(checkers_red)
+    free_yellow = get_free_masks(checkers_yellow)
+    current = np.where(red_on_move, free_red, free_yellow)
+    opponent = np.where(red_on_move, free_yellow, free_red)
+    if heuristic == "easy":
+        return opponent
+    if heuristic == "medium":
+        return opponent - 2 * current
+    return current - opponent
+
+
+def evaluate(checkers_red, checkers_yellow, next_on_move=None, heuristic="hard"):
+    """
+    Batched evaluate() of the search agents: +-1000 for won positions, the heuristic otherwise.
+    Returns (scores, statuses).
+    """
+    statuses = get_state_statuses(checkers_red, checkers_yellow)
+    scores = get_heuristic_scores(checkers_red, checkers_yellow, next_on_move, heuristic)
+    scores = np.where(statuses == State.RED, 1000, np.where(statuses == State.YEL, -1000, scores))
+    return scores, statuses
+
+
+def expand_last_ply(states, heuristic="hard"):
+    """
+    Generates every successor of the given non-terminal states and evaluates them in one batch.
+    Returns (parent indexes, columns, scores, statuses) with one entry per successor.
+    """
+    parents, columns, reds, yellows, next_players = [], [], [], [], []
+    for index, state in enumerate(states):
+        state_int = state.get_int_state()
+        for column in state.get_possible_columns():
+            # Adding the column's bottom bit lands on its lowest empty cell
+            move = (state_int + (1 << (column * M))) & (((1 << M) - 1) << (column * M))
+            red, yellow = state.checkers_red, state.checkers_yellow
+            if state.get_next_on_move() == State.RED:
+                red |= move
+            else:
+                yellow |= move
+            parents.append(index)
+            columns.append(column)
+            reds.append(red)
+            yellows.append(yellow)
+            next_players.append(State.YEL if state.get_next_on_move() == State.RED else State.RED)
+    scores, statuses = evaluate(reds, yellows, next_players, heuristic)
+    return np.array(parents, dtype=np.int64), np.array(columns, dtype=np.int8), scores, statuses
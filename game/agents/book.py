@@ -0,0 +1,114 @@
+import mmap
+import os
+import struct
+
+from game.models.config import M, N, WIN_CNT, BOOK_PATH, BOOK_PLY, BOOK_DEPTH
+from game.models.state import State
+
+
+class OpeningBook:
+    """
+    Read-only opening book backed by a memory-mapped file.
+    The file holds a header, the sorted 64-bit position keys and one byte per key
+    with the book column, so a lookup is a binary search over the mapped pages.
+    """
+    MAGIC = b'PV4B'
+    VERSION = 1
+    HEADER = struct.Struct('<4sHBBBBBxI')
+    KEY = struct.Struct('<Q')
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, cols, win_cnt, self.ply, self.depth, self.count = \
+            OpeningBook.HEADER.unpack_from(self.data, 0)
+        if magic != OpeningBook.MAGIC or version != OpeningBook.VERSION:
+            raise ValueError(f'{path} is not an opening book!')
+        if (rows, cols, win_cnt) != (M, N, WIN_CNT):
+            raise ValueError(f'Opening book {path} is for a {rows}x{cols} board with {win_cnt} in a row!')
+        self.keys_offset = OpeningBook.HEADER.size
+        self.moves_offset = self.keys_offset + self.count * OpeningBook.KEY.size
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, state):
+        """
+        Returns the book column for the state or None if the position is not in the book.
+        """
+        key = state.get_key()
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            mid_key = OpeningBook.KEY.unpack_from(self.data, self.keys_offset + mid * OpeningBook.KEY.size)[0]
+            if mid_key < key:
+                low = mid + 1
+            elif mid_key > key:
+                high = mid
+            else:
+                return self.data[self.moves_offset + mid]
+        return None
+
+    def close(self):
+        self.data.close()
+
+    @staticmethod
+    def write(path, entries, ply, depth):
+        """
+        Atomically writes a {position key: column} mapping as an opening book file.
+        """
+        keys = sorted(entries)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(OpeningBook.HEADER.pack(OpeningBook.MAGIC, OpeningBook.VERSION, M, N, WIN_CNT,
+                                               ply, depth, len(keys)))
+            file.write(b''.join(OpeningBook.KEY.pack(key) for key in keys))
+            file.write(bytes(entries[key] for key in keys))
+        # Replacing keeps already mapped books valid in running workers
+        os.replace(temp_path, path)
+
+
+def build_opening_book(path=BOOK_PATH, max_ply=BOOK_PLY, depth=BOOK_DEPTH, progress=None):
+    """
+    Searches every position reachable in at most max_ply moves to the given depth
+    and writes the chosen columns as an opening book. Returns the number of positions.
+    """
+    from game.agents.agents import CompetitiveAgent
+
+    if (M + 1) * N > 64:
+        raise ValueError(f'Positions of a {M}x{N} board do not fit into 64-bit book keys!')
+    agent = CompetitiveAgent(use_book=False)
+    entries = {}
+    frontier = [State()]
+    for ply in range(max_ply + 1):
+        next_frontier = {}
+        for state in frontier:
+            entries[state.get_key()] = agent.get_chosen_column(state, depth)
+            if ply < max_ply:
+                for column in state.get_possible_columns():
+                    child = state.generate_successor_state(column)
+                    if child.get_state_status() is None:
+                        next_frontier.setdefault(child.get_key(), child)
+        if progress is not None:
+            progress(ply, len(frontier))
+        frontier = list(next_frontier.values())
+    OpeningBook.write(path, entries, max_ply, depth)
+    return len(entries)
+
+
+_opening_book = None
+_opening_book_loaded = False
+
+
+def get_opening_book():
+    """
+    Returns the shared opening book, or None if the book file has not been generated.
+    """
+    global _opening_book, _opening_book_loaded
+    if not _opening_book_loaded:
+        _opening_book = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+        _opening_book_loaded = True
+    return _opening_book
@@ -0,0 +1,169 @@
+import itertools
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Array
+
+from game.models.config import PARALLEL_MIN_DEPTH
+from game.models.geometry import get_geometry
+from game.models.state import State
+from game.agents.transposition import TranspositionTable
+from game.worker import init_process
+
+BOUND_SLOTS = 256
+NO_BOUND = float('-inf')
+
+# Worker process state, set by `init_worker`
+_worker_agents = {}
+_worker_roots = {}
+_worker_bounds = None
+_worker_cancel_flags = None
+
+
+def init_worker(bounds, cancel_flags):
+    global _worker_bounds, _worker_cancel_flags
+    _worker_bounds = bounds
+    _worker_cancel_flags = cancel_flags
+
+
+def get_worker_agent(kind, heuristic, root):
+    """
+    Returns the worker's agent of the kind and heuristic. Its transposition table stays warm while
+    the tasks search the same root; entries of other roots are dropped, since a deeper entry of another
+    root would change the values and with them the chosen move. The move ordering is reset with them.
+    """
+    agent = _worker_agents.get((kind, heuristic))
+    if agent is None:
+        from game.agents.agents import MinimaxABAgent, NegascoutAgent
+        agent_class = MinimaxABAgent if kind == "minimax" else NegascoutAgent
+        agent = _worker_agents[(kind, heuristic)] = agent_class(heuristic=heuristic)
+    if _worker_roots.get((kind, heuristic)) != root:
+        agent.clear_tables()
+        _worker_roots[(kind, heuristic)] = root
+    return agent
+
+
+def search_root_move(kind, heuristic, dimensions, checkers_red, checkers_yellow, next_on_move, column, depth, slot):
+    """
+    Searches one root move in a worker process. Returns (value, nodes), or (None, nodes) if cancelled.
+
+    The window's lower bound is one below the best root value shared by the other workers, so a move
+    that ties the best value is still searched exactly, while worse moves fail low below it.
+    """
+    from game.agents.agents import SearchTimeout
+    agent = get_worker_agent(kind, heuristic, (dimensions, checkers_red, checkers_yellow, next_on_move))
+    agent.set_stop_check(lambda: _worker_cancel_flags[slot] != 0)
+    nodes_before = agent.nodes
+    state = State.from_bitboards(checkers_red, checkers_yellow, next_on_move, get_geometry(*dimensions))
+    state = state.generate_successor_state(column)
+    alpha = _worker_bounds[slot] - 1
+    try:
+        if kind == "minimax":
+            value, _ = agent.minimax(state, depth - 1, False, alpha, float('inf'))
+        else:
+            value, _ = agent.negascout(state, depth - 1, False, float('-inf'), -alpha)
+            value = -value
+    except SearchTimeout:
+        return None, agent.nodes - nodes_before
+    finally:
+        agent.set_stop_check(None)
+    if value > alpha:
+        # The value is exact, share it as the new bound
+        with _worker_bounds.get_lock():
+            if value > _worker_bounds[slot]:
+                _worker_bounds[slot] = value
+    return value, agent.nodes - nodes_before
+
+
+class RootParallelSearch:
+    """
+    Root splitting: every root move of the sequential agent is searched as a separate task in a pool
+    of processes, which share the best root value found so far as their alpha bound.
+    Results are combined in the sequential move order, so the chosen move is the one the sequential
+    search would choose, no matter which worker finishes first.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self.bounds = Array('d', BOUND_SLOTS)
+        self.cancel_flags = Array('b', BOUND_SLOTS, lock=False)
+        self.slots = itertools.count()
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_process,
+                                                initargs=("game.agents.parallel.init_worker", self.bounds,
+                                                          self.cancel_flags))
+            return self.pool
+
+    def search(self, agent, kind, state, depth, first_column=None):
+        """
+        Returns (value, best column, nodes) like the sequential root of `agent`.
+        Raises SearchTimeout when the deadline or stop check of the agent fires.
+        """
+        from game.agents.agents import SearchTimeout
+        if first_column is None:
+            key = agent.get_tt_key(state, True)
+            entry = agent.tt.lookup(key)
+            first_column = entry[4] if entry is not None else None
+        columns = agent.sorted_columns(state, first_column)
+
+        slot = next(self.slots) % BOUND_SLOTS
+        self.bounds[slot] = NO_BOUND
+        self.cancel_flags[slot] = 0
+        pool = self.get_pool()
+        futures = {pool.submit(search_root_move, kind, agent.heuristic, state.geometry.get_dimensions(),
+                               state.checkers_red, state.checkers_yellow, state.get_next_on_move(), column, depth,
+                               slot): column for column in columns}
+        values = {}
+        nodes = 0
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.01, return_when=FIRST_COMPLETED)
+                for future in done:
+                    value, task_nodes = future.result()
+                    nodes += task_nodes
+                    values[futures[future]] = value
+                if (agent.deadline is not None and time.perf_counter() > agent.deadline) or \
+                        (agent.stop_check is not None and agent.stop_check()):
+                    raise SearchTimeout()
+        finally:
+            self.cancel_flags[slot] = 1
+            for future in futures:
+                future.cancel()
+        if any(value is None for value in values.values()):
+            raise SearchTimeout()
+
+        best_value = float('-inf')
+        best_column = None
+        for column in columns:
+            if values[column] > best_value:
+                best_value = values[column]
+                best_column = column
+        agent.tt.store(agent.get_tt_key(state, True), best_value, depth, TranspositionTable.EXACT, best_column)
+        return best_value, best_column, nodes
+
+    def shutdown(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown(wait=True, cancel_futures=True)
+                self.pool = None
+
+
+_parallel_searches = {}
+
+
+def get_parallel_search(workers):
+    """
+    Returns the shared root-parallel search with the given number of worker processes.
+    """
+    if workers not in _parallel_searches:
+        _parallel_searches[workers] = RootParallelSearch(workers)
+    return _parallel_searches[workers]
+
+
+def use_parallel_search(workers, depth):
+    return workers > 1 and depth >= PARALLEL_MIN_DEPTH
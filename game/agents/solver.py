@@ -0,0 +1,212 @@
+import time
+
+from game.models.config import M, N, WIN_CNT
+from game.models.state import State
+from game.agents.transposition import TranspositionTable
+
+# The solver uses its own bitboard layout: every column takes M + 1 bits, the extra
+# sentinel bit on top keeps shifted runs from wrapping into the next column
+H = M + 1
+SIZE = M * N
+BOTTOM_MASK = sum(1 << (col * H) for col in range(N))
+BOARD_MASK = BOTTOM_MASK * ((1 << M) - 1)
+COLUMN_ORDER = sorted(range(N), key=lambda col: abs(N // 2 - col))
+DEADLINE_CHECK_MASK = 255  # Check the clock every 256 nodes, like `Agent`
+
+
+def get_win_offsets():
+    # For every direction and every place of the missing checker inside a run,
+    # the bit offsets of the other WIN_CNT - 1 checkers relative to the missing one
+    offsets = []
+    for shift in (1, H, H - 1, H + 1):
+        for missing in range(WIN_CNT):
+            offsets.append(tuple((k - missing) * shift for k in range(WIN_CNT) if k != missing))
+    return offsets
+
+
+WIN_OFFSETS = get_win_offsets()
+
+
+def column_mask(col):
+    return ((1 << M) - 1) << (col * H)
+
+
+def winning_cells(position, mask):
+    """
+    Returns the empty cells that would complete a run for the owner of position.
+    """
+    cells = 0
+    for offsets in WIN_OFFSETS:
+        run = BOARD_MASK
+        for offset in offsets:
+            run &= (position >> offset) if offset > 0 else (position << -offset)
+        cells |= run
+    return cells & (BOARD_MASK ^ mask)
+
+
+def possible_moves(mask):
+    return (mask + BOTTOM_MASK) & BOARD_MASK
+
+
+def popcount(bits):
+    return bin(bits).count("1")
+
+
+def from_state(state):
+    """
+    Converts a State into (position of the player on move, mask, number of moves).
+    """
+    own = state.get_checkers(state.get_next_on_move())
+    occupied = state.get_int_state()
+    position = 0
+    mask = 0
+    for col in range(N):
+        position |= ((own >> (col * M)) & ((1 << M) - 1)) << (col * H)
+        mask |= ((occupied >> (col * M)) & ((1 << M) - 1)) << (col * H)
+    return position, mask, popcount(occupied)
+
+
+class Solver:
+    """
+    Exact solver: bitboard negamax with null-window probing, a transposition table
+    of upper bounds and pruning of moves that hand the opponent an immediate win.
+    Scores are positive if the player on move wins, zero for a draw and negative
+    for a loss; the sooner the win, the larger the score.
+    A deadline or stop check set on the solver interrupts a solve with `SearchTimeout`.
+    """
+    def __init__(self, tt=None):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.nodes = 0
+        self.deadline = None
+        self.stop_check = None
+
+    def set_deadline(self, deadline):
+        self.deadline = deadline
+
+    def set_stop_check(self, stop_check):
+        self.stop_check = stop_check
+
+    def check_deadline(self):
+        self.nodes += 1
+        if not self.nodes & DEADLINE_CHECK_MASK:
+            if (self.deadline is not None and time.perf_counter() > self.deadline) or \
+                    (self.stop_check is not None and self.stop_check()):
+                from game.agents.agents import SearchTimeout
+                raise SearchTimeout()
+
+    def solve(self, state):
+        """
+        Returns the exact score of the state for the player on move.
+        """
+        if state.get_state_status() is not None:
+            raise Exception(f'State is finite!\n{state}')
+        return self.solve_position(*from_state(state))
+
+    def analyze(self, state):
+        """
+        Returns {column: exact score for the player on move after playing the column}.
+        """
+        if state.get_state_status() is not None:
+            raise Exception(f'State is finite!\n{state}')
+        scores = {}
+        for col in state.get_possible_columns():
+            child = state.generate_successor_state(col)
+            status = child.get_state_status()
+            if status == State.DRAW:
+                scores[col] = 0
+            elif status is not None:
+                scores[col] = (SIZE + 1 - popcount(state.get_int_state())) // 2
+            else:
+                scores[col] = -self.solve_position(*from_state(child))
+        return scores
+
+    def get_chosen_column(self, state):
+        position, mask, moves = from_state(state)
+        win = winning_cells(position, mask) & possible_moves(mask)
+        if win and moves < SIZE - 1:
+            return next(col for col in COLUMN_ORDER if win & column_mask(col))
+        scores = self.analyze(state)
+        return max(COLUMN_ORDER, key=lambda col: scores.get(col, float('-inf')))
+
+    def solve_position(self, position, mask, moves):
+        if moves == SIZE - 1:
+            return 0  # The last checker fills the board, which is always a draw
+        if winning_cells(position, mask) & possible_moves(mask):
+            return (SIZE + 1 - moves) // 2
+        low = -((SIZE - moves) // 2)
+        high = (SIZE + 1 - moves) // 2
+        while low < high:
+            # Probe with null windows, biased towards zero to settle the win/draw/loss question first
+            med = low + (high - low) // 2
+            if med <= 0 and int(low / 2) < med:
+                med = int(low / 2)
+            elif med >= 0 and high // 2 > med:
+                med = high // 2
+            result = self.negamax(position, mask, moves, med, med + 1)
+            if result <= med:
+                high = result
+            else:
+                low = result
+        return low
+
+    def negamax(self, position, mask, moves, alpha, beta):
+        # Precondition: the player on move cannot win with the next move
+        self.check_deadline()
+        if moves >= SIZE - 2:
+            return 0  # The opponent's last move can only fill the board
+
+        opponent_win = winning_cells(position ^ mask, mask)
+        possible = possible_moves(mask)
+        forced = possible & opponent_win
+        if forced:
+            if forced & (forced - 1):
+                return -((SIZE - moves) // 2)  # Two threats cannot both be blocked
+            possible = forced
+        possible &= ~(opponent_win >> 1)  # Never play right below an opponent's winning cell
+        if not possible:
+            return -((SIZE - moves) // 2)
+
+        low = -((SIZE - 2 - moves) // 2)
+        if alpha < low:
+            alpha = low
+            if alpha >= beta:
+                return alpha
+        high = (SIZE - 1 - moves) // 2
+        key = position + mask
+        entry = self.tt.lookup(key)
+        if entry is not None:
+            high = entry[1]
+        if beta > high:
+            beta = high
+            if alpha >= beta:
+                return beta
+
+        # Moves that create the most own threats are searched first
+        children = []
+        for col in COLUMN_ORDER:
+            move = possible & column_mask(col)
+            if move:
+                children.append((popcount(winning_cells(position | move, mask | move)), move))
+        children.sort(key=lambda child: -child[0])
+
+        for _, move in children:
+            score = -self.negamax(position ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        self.tt.store(key, alpha, 0, TranspositionTable.UPPER, None)
+        return alpha
+
+
+_solver = None
+
+
+def solve(state):
+    """
+    Returns the exact score of the state for the player on move, see `Solver`.
+    """
+    global _solver
+    if _solver is None:
+        _solver = Solver()
+    return _solver.solve(state)
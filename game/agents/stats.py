@@ -0,0 +1,50 @@
+class SearchStats:
+    """
+    Counters of one computer move, filled in by the agents when they are given an instance.
+    Agents without stats only pay for an `is not None` check per searched node.
+    """
+    def __init__(self):
+        self.source = "search"  # "tactics", "book", "solver" or "search"
+        self.nodes = 0
+        self.interior_nodes = 0
+        self.children = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_hits = 0
+        self.depth_reached = 0
+        self.depths = []  # (depth, nodes, seconds) for every completed depth
+
+    def record_node(self, children, cutoff):
+        """
+        Records an expanded node: number of children searched and whether it failed high.
+        """
+        self.interior_nodes += 1
+        self.children += children
+        if cutoff:
+            self.cutoffs += 1
+            if children == 1:
+                self.first_move_cutoffs += 1
+
+    def record_depth(self, depth, nodes, seconds):
+        self.depth_reached = depth
+        self.nodes += nodes
+        self.depths.append((depth, nodes, seconds))
+
+    def get_branching_factor(self):
+        """
+        Average number of children searched per expanded node.
+        """
+        return self.children / self.interior_nodes if self.interior_nodes else 0.0
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "nodes": self.nodes,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "tt_hits": self.tt_hits,
+            "depth_reached": self.depth_reached,
+            "branching_factor": round(self.get_branching_factor(), 3),
+            "depths": [{"depth": depth, "nodes": nodes, "ms": round(seconds * 1000, 3)}
+                       for depth, nodes, seconds in self.depths],
+        }
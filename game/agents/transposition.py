@@ -0,0 +1,64 @@
+from game.models.config import TT_ENTRIES
+
+
+class TranspositionTable:
+    """
+    Bounded two-tier transposition table.
+    Every bucket holds a depth-preferred entry and an always-replace entry,
+    so deep results survive while fresh shallow results still get cached.
+    Entries are tuples (key, value, depth, flag, best_column); size buckets hold at most 2 * size entries.
+    """
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def __init__(self, size=TT_ENTRIES // 2):
+        if size <= 0:
+            raise ValueError(f'Transposition table size must be positive, got {size}!')
+        self.size = size
+        self.deep = {}
+        self.recent = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.deep) + len(self.recent)
+
+    def lookup(self, key):
+        index = hash(key) % self.size
+        entry = self.deep.get(index)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.recent.get(index)
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, value, depth, flag, best_column):
+        index = hash(key) % self.size
+        entry = (key, value, depth, flag, best_column)
+        deep = self.deep.get(index)
+        if deep is None or deep[0] == key or depth >= deep[2]:
+            if deep is not None and deep[0] != key:
+                # Demote the replaced entry instead of dropping it
+                self.recent[index] = deep
+            self.deep[index] = entry
+        else:
+            self.recent[index] = entry
+
+    def clear(self):
+        self.deep.clear()
+        self.recent.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        return {
+            "size": self.size,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
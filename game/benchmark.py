@@ -0,0 +1,126 @@
+import platform
+import time
+
+from game.agents.agents import MinimaxABAgent, NegascoutAgent, CompetitiveAgent
+from game.models.config import M, N, WIN_CNT
+from game.models.state import State
+from game.models.store import decode_moves
+
+# Fixed benchmark corpus: positions as move strings from the empty board
+POSITIONS = {
+    "opening": ["", "3", "33", "3342"],
+    "midgame": ["315421536562", "41565323454124", "4163062533055162"],
+    "endgame": ["21060023514500530321443662", "5012325524661042314214621515",
+                "135352432105552114324016040266"],
+}
+
+AGENTS = {
+    "minimax": lambda: MinimaxABAgent(heuristic="hard"),
+    "negascout": lambda: NegascoutAgent(heuristic="hard"),
+    "competitive": lambda: CompetitiveAgent(use_book=False, heuristic="hard"),
+}
+
+
+def get_position(moves):
+    state = State()
+    for column in decode_moves(moves):
+        state = state.generate_successor_state(column)
+    return state
+
+
+def perft(state, depth):
+    """
+    Number of move sequences of exactly the given length; finished games are not continued.
+    """
+    if depth == 0:
+        return 1
+    if state.get_state_status() is not None:
+        return 0
+    return sum(perft(state.generate_successor_state(column), depth - 1)
+               for column in state.get_possible_columns())
+
+
+def run_perft(depth):
+    results = []
+    for phase, positions in POSITIONS.items():
+        for moves in positions:
+            state = get_position(moves)
+            start_time = time.perf_counter()
+            nodes = perft(state, depth)
+            elapsed_time = time.perf_counter() - start_time
+            results.append({
+                "phase": phase,
+                "moves": moves,
+                "depth": depth,
+                "nodes": nodes,
+                "seconds": round(elapsed_time, 6),
+                "nps": round(nodes / elapsed_time) if elapsed_time else None,
+            })
+    return results
+
+
+def run_search(agent_names, depths, max_seconds=None):
+    """
+    Times a fresh agent per position and depth. Once a depth takes longer than max_seconds,
+    deeper searches of the same agent and position are skipped.
+    """
+    results = []
+    for agent_name in agent_names:
+        for phase, positions in POSITIONS.items():
+            for moves in positions:
+                state = get_position(moves)
+                for depth in depths:
+                    agent = AGENTS[agent_name]()
+                    start_time = time.perf_counter()
+                    column = agent.get_chosen_column(state, depth)
+                    elapsed_time = time.perf_counter() - start_time
+                    results.append({
+                        "agent": agent_name,
+                        "phase": phase,
+                        "moves": moves,
+                        "depth": depth,
+                        "column": column,
+                        "nodes": agent.nodes,
+                        "seconds": round(elapsed_time, 6),
+                        "nps": round(agent.nodes / elapsed_time) if elapsed_time else None,
+                    })
+                    if max_seconds is not None and elapsed_time > max_seconds:
+                        break
+    return results
+
+
+def run_benchmark(agent_names=tuple(AGENTS), depths=range(3, 10), perft_depth=5, max_seconds=None):
+    return {
+        "python": platform.python_version(),
+        "board": {"rows": M, "columns": N, "win_count": WIN_CNT},
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "perft": run_perft(perft_depth),
+        "search": run_search(agent_names, list(depths), max_seconds),
+    }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Lists regressions of current results against a baseline: changed perft counts,
+    different node counts or chosen columns, and nodes/sec drops larger than tolerance.
+    """
+    regressions = []
+    perft_baseline = {(entry["moves"], entry["depth"]): entry for entry in baseline.get("perft", [])}
+    for entry in current["perft"]:
+        old = perft_baseline.get((entry["moves"], entry["depth"]))
+        if old is not None and old["nodes"] != entry["nodes"]:
+            regressions.append(f'perft {entry["moves"]!r} depth {entry["depth"]}: '
+                               f'{old["nodes"]} -> {entry["nodes"]} nodes')
+    search_baseline = {(entry["agent"], entry["moves"], entry["depth"]): entry for entry in baseline.get("search", [])}
+    for entry in current["search"]:
+        old = search_baseline.get((entry["agent"], entry["moves"], entry["depth"]))
+        if old is None:
+            continue
+        name = f'{entry["agent"]} {entry["moves"]!r} depth {entry["depth"]}'
+        if old["nodes"] < entry["nodes"]:
+            regressions.append(f'{name}: {old["nodes"]} -> {entry["nodes"]} nodes')
+        if old["column"] != entry["column"]:
+            regressions.append(f'{name}: column {old["column"]} -> {entry["column"]}')
+        if old["nps"] and entry["nps"] and entry["nps"] < old["nps"] * (1 - tolerance):
+            regressions.append(f'{name}: {old["nps"]} -> {entry["nps"]} nodes/sec')
+    return regressions
@@ -0,0 +1,83 @@
+import json
+
+from django.db.models import Q
+
+from game.models import GameLog
+from game.models.state import State
+from game.models.store import unpack_moves
+
+RESULT_CODES = {"red": State.RED, "yellow": State.YEL, "draw": State.DRAW}
+
+
+def get_game_logs(geometry, since=None, until=None, agent=None, opening=None):
+    """
+    Logged games of the geometry with a known result, in insertion order, as
+    (id, packed moves, result) tuples; filters use the indexed columns where there is one.
+    """
+    rows, cols, win_count = geometry.get_dimensions()
+    logs = GameLog.objects.filter(rows=rows, cols=cols, win_count=win_count).exclude(result="")
+    if since is not None:
+        logs = logs.filter(timestamp__gte=since)
+    if until is not None:
+        logs = logs.filter(timestamp__lt=until)
+    if agent is not None:
+        # "competitive" matches every configuration of the agent, e.g. "competitive:6:hard"
+        logs = logs.filter(Q(red_agent__startswith=agent) | Q(yellow_agent__startswith=agent))
+    if opening is not None:
+        logs = logs.filter(opening__startswith=opening)
+    return logs.order_by("id").values_list("id", "moves", "result")
+
+
+def iter_positions(game_logs, geometry, chunk_size=2000):
+    """
+    Replays the games and yields (game id, ply, state, result code) for the position before every move.
+    The rows are fetched chunk_size at a time and the state is updated in place, so memory use does not
+    depend on the number of games. The state must not be kept past the next position.
+    """
+    for game_id, moves, result in game_logs.iterator(chunk_size=chunk_size):
+        state = State(geometry)
+        for ply, column in enumerate(unpack_moves(moves, geometry.cols)):
+            yield game_id, ply, state, RESULT_CODES[result]
+            state.play(column)
+
+
+def get_bitboard_size(geometry):
+    # Bytes per bitboard of the binary format: 8 covers the default board, larger boards take 16
+    return 8 if geometry.size <= 64 else 16
+
+
+def to_binary(state, result, bitboard_size):
+    """
+    Fixed-width record: red and yellow bitboards (little endian, `get_bitboard_size` bytes each),
+    then player on move and result, one byte each.
+    """
+    return (state.checkers_red.to_bytes(bitboard_size, "little") +
+            state.checkers_yellow.to_bytes(bitboard_size, "little") +
+            bytes((state.get_next_on_move(), result)))
+
+
+def to_json(game_id, ply, state, result):
+    return json.dumps({"game": game_id, "ply": ply, "red": state.checkers_red, "yellow": state.checkers_yellow,
+                       "side": state.get_next_on_move(), "result": result})
+
+
+def export_positions(file, fmt, geometry, chunk_size=2000, **filters):
+    """
+    Writes the positions of the logged games to a binary file in "jsonl" or "binary" format.
+    "jsonl" has one JSON object per position, "binary" fixed-width records (see `to_binary`);
+    the result code is 0 for red, 1 for yellow and 2 for a draw.
+    Returns (games, positions) written.
+    """
+    games = positions = 0
+    last_game = None
+    bitboard_size = get_bitboard_size(geometry)
+    for game_id, ply, state, result in iter_positions(get_game_logs(geometry, **filters), geometry, chunk_size):
+        if fmt == "binary":
+            file.write(to_binary(state, result, bitboard_size))
+        else:
+            file.write(to_json(game_id, ply, state, result).encode() + b"\n")
+        positions += 1
+        if game_id != last_game:
+            games += 1
+            last_game = game_id
+    return games, positions
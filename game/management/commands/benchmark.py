@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.benchmark import AGENTS, compare, run_benchmark
+
+
+class Command(BaseCommand):
+    help = "Meri perft brojeve čvorova i brzinu pretrage agenata na fiksnom skupu pozicija, rezultat je JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--agents", nargs="+", choices=list(AGENTS), default=list(AGENTS),
+                            help="Agenti koji se mere.")
+        parser.add_argument("--depths", default="3-9", help="Dubine pretrage, npr. 3-9 ili 3,5,7.")
+        parser.add_argument("--perft-depth", type=int, default=5, help="Dubina perft brojanja.")
+        parser.add_argument("--max-seconds", type=float, default=30,
+                            help="Preskače dublje pretrage pozicije kada jedna traje duže od ovoga.")
+        parser.add_argument("--output", help="Fajl za JSON rezultat (podrazumevano standardni izlaz).")
+        parser.add_argument("--baseline", help="JSON rezultat prethodnog merenja za poređenje.")
+
+    def handle(self, *args, **options):
+        try:
+            if "-" in options["depths"]:
+                low, high = options["depths"].split("-")
+                depths = range(int(low), int(high) + 1)
+            else:
+                depths = [int(depth) for depth in options["depths"].split(",")]
+        except ValueError:
+            raise CommandError(f'Invalid depths {options["depths"]!r}.')
+
+        results = run_benchmark(options["agents"], depths, options["perft_depth"], options["max_seconds"])
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                regressions = compare(json.load(file), results)
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
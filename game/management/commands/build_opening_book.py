@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game.agents.book import build_opening_book
+from game.models.config import BOOK_PATH, BOOK_PLY, BOOK_DEPTH
+
+
+class Command(BaseCommand):
+    help = "Generiše knjigu otvaranja: najbolji potez za svaku poziciju do zadatog broja poteza."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ply", type=int, default=BOOK_PLY,
+                            help="Maksimalan broj odigranih poteza u pozicijama knjige.")
+        parser.add_argument("--depth", type=int, default=BOOK_DEPTH,
+                            help="Dubina pretrage za izbor poteza.")
+        parser.add_argument("--output", default=BOOK_PATH, help="Putanja do fajla knjige.")
+
+    def handle(self, *args, **options):
+        start_time = time.perf_counter()
+
+        def progress(ply, positions):
+            self.stdout.write(f"Ply {ply}: {positions} positions ({time.perf_counter() - start_time:.1f}s)")
+
+        count = build_opening_book(options["output"], options["ply"], options["depth"], progress)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} positions to {options['output']}"))
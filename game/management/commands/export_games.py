@@ -0,0 +1,67 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from game.export import export_positions
+from game.models.config import M, N, WIN_CNT
+from game.models.geometry import get_geometry
+
+
+def parse_time(value):
+    """
+    Datum (YYYY-MM-DD) ili datum i vreme u ISO formatu; vreme bez zone je u zoni podešavanja.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f"Invalid date {value!r}.")
+        moment = timezone.datetime(date.year, date.month, date.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = ("Izvozi pozicije odigranih igara iz GameLog-a u jsonl ili binarnom formatu za analizu van servera; "
+            "format zapisa je opisan u game.export.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help='Izlazni fajl, "-" za standardni izlaz.')
+        parser.add_argument("--format", choices=("jsonl", "binary"), default="jsonl", help="Format zapisa.")
+        parser.add_argument("--since", help="Samo igre od ovog datuma (YYYY-MM-DD ili ISO datum i vreme).")
+        parser.add_argument("--until", help="Samo igre pre ovog datuma.")
+        parser.add_argument("--agent", help='Samo igre agenta, npr. "competitive" ili "minimax:4".')
+        parser.add_argument("--opening", help="Samo igre sa ovim početkom (potezi u osnovi 36).")
+        parser.add_argument("--rows", type=int, default=M, help="Broj redova table.")
+        parser.add_argument("--cols", type=int, default=N, help="Broj kolona table.")
+        parser.add_argument("--win-count", type=int, default=WIN_CNT, help="Dužina niza za pobedu.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Broj igara po čitanju iz baze.")
+
+    def handle(self, *args, **options):
+        try:
+            geometry = get_geometry(options["rows"], options["cols"], options["win_count"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        filters = {
+            "since": parse_time(options["since"]) if options["since"] else None,
+            "until": parse_time(options["until"]) if options["until"] else None,
+            "agent": options["agent"],
+            "opening": options["opening"],
+        }
+
+        start_time = time.perf_counter()
+        if options["output"] == "-":
+            games, positions = export_positions(sys.stdout.buffer, options["format"], geometry,
+                                                options["chunk_size"], **filters)
+            sys.stdout.buffer.flush()
+        else:
+            with open(options["output"], "wb") as file:
+                games, positions = export_positions(file, options["format"], geometry, options["chunk_size"],
+                                                    **filters)
+        # Pri izvozu na standardni izlaz izveštaj ide na izlaz za greške, da ne pokvari zapise
+        output = self.stderr if options["output"] == "-" else self.stdout
+        output.write(f"{games} games, {positions} positions exported in {time.perf_counter() - start_time:.2f} s")
@@ -0,0 +1,53 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import GameLog
+from game.tournament import create_tasks, get_standings, parse_agent_config, play_game, to_game_log
+from game.worker import init_process
+
+
+class Command(BaseCommand):
+    help = ("Igra turnir svako-sa-svakim između konfiguracija agenata (vrsta:dubina:heuristika) "
+            "u više procesa i upisuje partije u GameLog.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("agents", nargs="+", help='Konfiguracije agenata, npr. "competitive:6:hard".')
+        parser.add_argument("--games", type=int, default=10, help="Broj partija po paru za svaku boju.")
+        parser.add_argument("--opening-plies", type=int, default=2, help="Broj nasumičnih poteza otvaranja.")
+        parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Broj procesa.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Broj partija po upisu u bazu.")
+        parser.add_argument("--seed", type=int, help="Seme za nasumična otvaranja.")
+
+    def handle(self, *args, **options):
+        configs = options["agents"]
+        try:
+            for config in configs:
+                parse_agent_config(config)
+        except ValueError as e:
+            raise CommandError(str(e))
+        if len(set(configs)) < 2:
+            raise CommandError("At least two different agent configs are needed.")
+
+        tasks = create_tasks(configs, options["games"], options["opening_plies"], options["seed"])
+        results = []
+        batch = []
+        # Procesi pokrenuti sa "spawn" ili "forkserver" moraju prvo da podese Django
+        with multiprocessing.Pool(options["workers"], initializer=init_process) as pool:
+            # Jedna partija po zadatku, rezultati stižu redom završetka
+            for result in pool.imap_unordered(play_game, tasks, chunksize=1):
+                results.append(result)
+                batch.append(to_game_log(result))
+                if len(batch) >= options["batch_size"]:
+                    GameLog.objects.bulk_create(batch)
+                    batch = []
+                    self.stdout.write(f"{len(results)}/{len(tasks)} games played")
+        if batch:
+            GameLog.objects.bulk_create(batch)
+
+        standings = get_standings(results)
+        self.stdout.write(f"{'agent':<30}{'wins':>6}{'draws':>7}{'losses':>8}{'points':>8}{'sec/game':>10}")
+        for config, entry in sorted(standings.items(), key=lambda item: -item[1]["points"]):
+            games = entry["wins"] + entry["draws"] + entry["losses"]
+            self.stdout.write(f"{config:<30}{entry['wins']:>6}{entry['draws']:>7}{entry['losses']:>8}"
+                              f"{entry['points']:>8.1f}{entry['seconds'] / games:>10.3f}")
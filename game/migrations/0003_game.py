@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0002_rename_moves_gamelog_log_data_remove_gamelog_winner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('game_id', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('checkers_red', models.CharField(default='0', max_length=32)),
+                ('checkers_yellow', models.CharField(default='0', max_length=32)),
+                ('next_on_move', models.SmallIntegerField(default=0)),
+                ('moves', models.TextField(blank=True, default='')),
+                ('red_agent', models.CharField(max_length=20)),
+                ('yellow_agent', models.CharField(max_length=20)),
+                ('max_depth', models.IntegerField(null=True)),
+                ('time_ms', models.IntegerField(null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
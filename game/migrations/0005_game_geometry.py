@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_bestmove'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='cols',
+            field=models.SmallIntegerField(default=7),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rows',
+            field=models.SmallIntegerField(default=6),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='win_count',
+            field=models.SmallIntegerField(default=4),
+        ),
+        migrations.AlterField(
+            model_name='bestmove',
+            name='key',
+            field=models.CharField(max_length=128, unique=True),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_game_geometry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamelog',
+            name='cols',
+            field=models.SmallIntegerField(default=7),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='moves',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='opening',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='red_agent',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='result',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=6),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='rows',
+            field=models.SmallIntegerField(default=6),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='win_count',
+            field=models.SmallIntegerField(default=4),
+        ),
+        migrations.AddField(
+            model_name='gamelog',
+            name='yellow_agent',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AlterField(
+            model_name='gamelog',
+            name='log_data',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='gamelog',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_gamelog_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='move_ms',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,3 @@
+from .game import Game, GameLog, BestMove
+
+__all__ = ["Game", "GameLog", "BestMove"]
@@ -14,6 +14,53 @@ INFO_SIDE_OFFSET = 10
 FRAMES_PER_SEC = 120
 INFO_FONT = None
 
+# Search settings
+TT_ENTRIES = 1 << 15  # Entries of one transposition table, about 300 bytes each (10 MB when full)
+SEARCH_WORKERS = 2  # Number of warm search processes per server process
+SEARCH_QUEUE_SIZE = 8  # Searches waiting or running before async endpoints answer 503
+SEARCH_RETRY_AFTER_SEC = 1  # Retry-After sent with the 503 response
+SEARCH_TIMEOUT_SEC = 60  # Longest wait for a computer move searched only to a depth, without a time budget
+SEARCH_TIMEOUT_MARGIN_SEC = 5  # Added to the time budget of a computer move before its request gives up
+SOLVER_EMPTY_CELLS = 14  # CompetitiveAgent solves positions with at most this many empty cells exactly
+PARALLEL_WORKERS = 0  # Processes of the root-parallel CompetitiveAgent search, 0 or 1 searches sequentially
+PARALLEL_MIN_DEPTH = 6  # Shallower searches stay sequential, the process round trip costs more than it saves
+SEARCH_STATS = False  # Collect search stats for every computer move, not only for requests with "debug"
+WARMUP_DEPTH = 4  # Depth of the warm-up searches run when the app starts, 0 skips the searches
+ANALYZE_MAX_POSITIONS = 500  # Positions accepted by one /analyze/ request
+ANALYZE_MAX_DEPTH = 8  # Larger depths requested from /analyze/ are lowered to this one
+ANALYZE_MAX_TIME_MS = 1000  # Largest time budget of one analyzed position
+ANALYZE_TIMEOUT_SEC = 30  # Longest time one /analyze/ request waits for its positions
+STREAM_KEEPALIVE_SEC = 1  # Comment sent while a streamed search runs, so a closed connection is noticed
+
+# Pondering settings
+PONDER_REPLIES = 3  # Likely human replies searched while the human thinks, 0 disables pondering
+# Pondering searches running or waiting at once, over all games; one search process always stays free
+# for computer moves, since pondering shares their pool
+PONDER_MAX_TASKS = SEARCH_WORKERS - 1
+PONDER_CACHE_SIZE = 10000  # Prepared moves kept over all games (a few hundred bytes each)
+PONDER_TTL_SEC = 10 * 60  # Lifetime of the prepared moves of a game
+
+# Game store settings
+GAME_STORE_BACKEND = "db"  # "memory" (per process LRU), "cache" (Django cache) or "db"
+GAME_STORE_SIZE = 10000  # Games kept by the in-process LRU store
+GAME_STORE_TTL_SEC = 24 * 60 * 60  # Lifetime of games kept in the Django cache
+
+# Best move cache settings
+MOVE_CACHE_SIZE = 10000  # Moves kept by the in-process LRU front, 0 disables it
+MOVE_CACHE_DB_SIZE = 200000  # Moves kept in the database, 0 disables the persistent tier
+MOVE_CACHE_EVICTION = "lru"  # "lru" evicts the least recently used move, "fifo" the oldest one
+MOVE_CACHE_EVICTION_INTERVAL = 100  # Database inserts between size checks
+
+# Game log settings
+GAME_LOG_QUEUE_SIZE = 10000  # Finished games waiting for the writer, further games are dropped
+GAME_LOG_BATCH_SIZE = 100  # Games per bulk insert
+GAME_LOG_FLUSH_SEC = 5  # Longest time a finished game waits for a full batch
+GAME_LOG_OPENING_PLY = 8  # Moves stored in the indexed opening prefix (at most 16)
+
+# Opening book settings
+BOOK_PLY = 4  # Positions up to this many moves are stored in the opening book
+BOOK_DEPTH = 8  # Search depth used to pick the book moves
+
 # Define colors (use RGB tuples)
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -27,6 +74,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent  # Adjust as needed to
 
 ACTIONS_FOLDER = os.path.join(BASE_DIR, 'game', 'actions')
 IMG_FOLDER = os.path.join(BASE_DIR, 'game', 'static', 'images')
+BOOK_PATH = os.path.join(BASE_DIR, 'game', 'data', 'opening_book.bin')
 
 # Ensure folders exist (optional, useful for development)
 os.makedirs(ACTIONS_FOLDER, exist_ok=True)
@@ -0,0 +1,51 @@
+from django.db import models
+
+from .config import M, N, WIN_CNT
+
+
+class Game(models.Model):
+    """
+    Kompaktan zapis igre u toku: dimenzije table, bitborde oba igrača (heksadecimalno),
+    igrač na potezu, niz poteza i vremena poteza (vidi `encode_move_ms`).
+    """
+    game_id = models.CharField(max_length=32, primary_key=True)
+    checkers_red = models.CharField(max_length=32, default="0")
+    checkers_yellow = models.CharField(max_length=32, default="0")
+    next_on_move = models.SmallIntegerField(default=0)
+    moves = models.TextField(blank=True, default="")
+    move_ms = models.TextField(blank=True, default="")
+    red_agent = models.CharField(max_length=20)
+    yellow_agent = models.CharField(max_length=20)
+    max_depth = models.IntegerField(null=True)
+    time_ms = models.IntegerField(null=True)
+    rows = models.SmallIntegerField(default=M)
+    cols = models.SmallIntegerField(default=N)
+    win_count = models.SmallIntegerField(default=WIN_CNT)
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class GameLog(models.Model):
+    """
+    Zapis odigrane igre: rezultat, agenti, dimenzije table i potezi spakovani po bitovima (vidi `pack_moves`).
+    Početak partije je sačuvan i kao niz znakova, da bi se igre mogle birati po otvaranju preko indeksa.
+    """
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    result = models.CharField(max_length=6, blank=True, default="", db_index=True)
+    opening = models.CharField(max_length=16, blank=True, default="", db_index=True)
+    moves = models.BinaryField(default=b"")
+    red_agent = models.CharField(max_length=40, blank=True, default="")
+    yellow_agent = models.CharField(max_length=40, blank=True, default="")
+    rows = models.SmallIntegerField(default=M)
+    cols = models.SmallIntegerField(default=N)
+    win_count = models.SmallIntegerField(default=WIN_CNT)
+    log_data = models.TextField(blank=True, default="")
+
+
+class BestMove(models.Model):
+    """
+    Trajno zapamćen najbolji potez za (bitborde, igrač na potezu, dubina, vrsta agenta).
+    """
+    key = models.CharField(max_length=128, unique=True)
+    column = models.SmallIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(auto_now=True, db_index=True)
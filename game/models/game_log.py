@@ -0,0 +1,141 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.db import DatabaseError
+
+from game.models.config import GAME_LOG_QUEUE_SIZE, GAME_LOG_BATCH_SIZE, GAME_LOG_FLUSH_SEC, GAME_LOG_OPENING_PLY
+from game.models.game import GameLog
+from game.models.geometry import DEFAULT_GEOMETRY
+from game.models.state import State
+from game.models.store import encode_moves, pack_moves
+
+RESULTS = {State.RED: "red", State.YEL: "yellow", State.DRAW: "draw"}
+
+logger = logging.getLogger("game.log")
+
+_STOP = object()  # Oznaka u redu koja zaustavlja pozadinsku nit
+
+
+def create_game_log(columns, result, red_agent, yellow_agent, geometry=None, log_data=None):
+    """
+    Pravi (nesačuvan) zapis odigrane igre; log_data su dodatni podaci igre, upisuju se kao JSON.
+    """
+    geometry = geometry if geometry is not None else DEFAULT_GEOMETRY
+    rows, cols, win_count = geometry.get_dimensions()
+    return GameLog(result=result, opening=encode_moves(columns[:GAME_LOG_OPENING_PLY]),
+                   moves=pack_moves(columns, cols), red_agent=red_agent, yellow_agent=yellow_agent,
+                   rows=rows, cols=cols, win_count=win_count,
+                   log_data=json.dumps(log_data) if log_data is not None else "")
+
+
+class GameLogWriter:
+    """
+    Baferisan upis odigranih igara: zahtev samo stavlja zapis u red, a pozadinska nit ga upisuje
+    sa `bulk_create` kada se skupi `batch_size` igara ili prođe `flush_sec` od prve igre u paketu.
+    Kada je red pun, igra se ne beleži, da zahtevi nikad ne bi čekali na bazu.
+    """
+    def __init__(self, queue_size=GAME_LOG_QUEUE_SIZE, batch_size=GAME_LOG_BATCH_SIZE, flush_sec=GAME_LOG_FLUSH_SEC):
+        self.queue = queue.Queue(queue_size)
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.thread = None
+        # Upis paketa ne sme da se preplete sa `flush` iz druge niti
+        self.lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="game-log-writer", daemon=True)
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def log(self, game_log):
+        try:
+            self.queue.put_nowait(game_log)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        stopped = False
+        while not stopped:
+            game_log = self.queue.get()
+            if game_log is _STOP:
+                break
+            batch = [game_log]
+            deadline = time.monotonic() + self.flush_sec
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    game_log = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if game_log is _STOP:
+                    stopped = True
+                    break
+                batch.append(game_log)
+            self.write(batch)
+
+    def stop(self):
+        """
+        Zaustavlja pozadinsku nit tako da ona upiše paket koji je već preuzela iz reda,
+        zatim upisuje ostatak reda. Poziva se pri izlasku iz procesa.
+        """
+        thread, self.thread = self.thread, None
+        if thread is not None:
+            try:
+                self.queue.put(_STOP, timeout=self.flush_sec)
+            except queue.Full:
+                pass  # Nit ne prazni red, ostatak upisuje `flush`
+            thread.join(self.flush_sec)
+        self.flush()
+
+    def flush(self):
+        """
+        Odmah upisuje sve igre iz reda u niti pozivaoca.
+        """
+        batch = []
+        while True:
+            try:
+                game_log = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if game_log is not _STOP:
+                batch.append(game_log)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+
+    def write(self, batch):
+        with self.lock:
+            try:
+                GameLog.objects.bulk_create(batch)
+                self.written += len(batch)
+            except DatabaseError as e:
+                self.dropped += len(batch)
+                logger.error(json.dumps({"event": "game_log", "error": str(e), "dropped": len(batch)}))
+
+    def get_stats(self):
+        return {"pending": self.queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+
+_game_log_writer = None
+
+
+def get_game_log_writer():
+    """
+    Vraća deljeni `GameLogWriter` i pokreće njegovu pozadinsku nit pri prvom pozivu.
+    """
+    global _game_log_writer
+    if _game_log_writer is None:
+        _game_log_writer = GameLogWriter()
+        _game_log_writer.start()
+    return _game_log_writer
@@ -0,0 +1,170 @@
+from functools import cached_property
+
+from .config import M, N, WIN_CNT
+
+MAX_SIDE = 16  # Rows and columns of the largest board
+MAX_CELLS = 128  # Bitboards are stored as 32 hex digits
+
+
+class Geometry:
+    """
+    Board dimensions and the bitboard tables derived from them (bit = row + column * rows).
+    Tables are built on first use and shared by all states of the geometry, see `get_geometry`.
+    """
+    def __init__(self, rows, cols, win_count):
+        if not (1 <= rows <= MAX_SIDE and 1 <= cols <= MAX_SIDE) or rows * cols > MAX_CELLS:
+            raise ValueError(f'Invalid board size {rows}x{cols}!')
+        if not 2 <= win_count <= max(rows, cols):
+            raise ValueError(f'Invalid win length {win_count} for a {rows}x{cols} board!')
+        self.rows = rows
+        self.cols = cols
+        self.win_count = win_count
+        self.size = rows * cols
+        self.draw_mask = (1 << self.size) - 1
+        self.column_mask = (1 << rows) - 1
+        self.top_mask = 1 << (rows - 1)
+        self.top_row_mask = sum(self.top_mask << (col * rows) for col in range(cols))
+        self.bottom_row_mask = sum(1 << (col * rows) for col in range(cols))
+        self.free_columns = {}
+
+    def __repr__(self):
+        return f'Geometry({self.rows}, {self.cols}, {self.win_count})'
+
+    def get_dimensions(self):
+        return self.rows, self.cols, self.win_count
+
+    def get_cell(self, row, col):
+        return row + col * self.rows
+
+    @cached_property
+    def directions(self):
+        # For every direction: the bit distance between neighbouring cells and whether
+        # a run of win_count checkers starting at (row, col) stays on the board
+        rows, cols, length = self.rows, self.cols, self.win_count - 1
+        return (
+            (1, lambda row, col: row + length < rows),  # Column wins
+            (rows, lambda row, col: col + length < cols),  # Row wins
+            (rows - 1, lambda row, col: row - length >= 0 and col + length < cols),  # Main diagonal wins
+            (rows + 1, lambda row, col: row + length < rows and col + length < cols),  # Anti-diagonal wins
+        )
+
+    @cached_property
+    def win_shifts(self):
+        # For every direction: the mask of cells from which a run stays on the board
+        # and the bit offsets of the other checkers of the run
+        win_shifts = []
+        for shift, is_run_start in self.directions:
+            start_mask = 0
+            for row in range(self.rows):
+                for col in range(self.cols):
+                    if is_run_start(row, col):
+                        start_mask |= 1 << self.get_cell(row, col)
+            if start_mask:
+                win_shifts.append((start_mask, tuple(k * shift for k in range(1, self.win_count))))
+        return tuple(win_shifts)
+
+    @cached_property
+    def threat_shifts(self):
+        # For every direction and every place of the missing checker inside a run:
+        # the run start mask, the offset of the missing cell and the offsets of the other cells
+        threat_shifts = []
+        for start_mask, offsets in self.win_shifts:
+            offsets = (0,) + offsets
+            for missing in offsets:
+                threat_shifts.append((start_mask, missing, tuple(offset for offset in offsets if offset != missing)))
+        return tuple(threat_shifts)
+
+    @cached_property
+    def win_masks(self):
+        win_masks = set()
+        for start_mask, offsets in self.win_shifts:
+            run_mask = 1 | sum(1 << offset for offset in offsets)
+            for cell in range(self.size):
+                if (start_mask >> cell) & 1:
+                    win_masks.add(run_mask << cell)
+        return win_masks
+
+    @cached_property
+    def cell_masks(self):
+        # For every cell, the win masks passing through it
+        return tuple(tuple(mask for mask in self.win_masks if (mask >> cell) & 1) for cell in range(self.size))
+
+    @cached_property
+    def center_order(self):
+        return tuple(sorted(range(self.cols), key=lambda col: abs(self.cols // 2 - col)))
+
+    @cached_property
+    def center_rank(self):
+        # Position of every column in center_order
+        return tuple(self.center_order.index(col) for col in range(self.cols))
+
+    def get_free_columns(self, free_top):
+        """
+        Columns whose top cell is in free_top; the tuples are memoised per pattern of free top cells.
+        """
+        columns = self.free_columns.get(free_top)
+        if columns is None:
+            columns = self.free_columns[free_top] = tuple(
+                col for col in range(self.cols) if (free_top >> (col * self.rows + self.rows - 1)) & 1)
+        return columns
+
+    def is_win(self, checkers):
+        for start_mask, offsets in self.win_shifts:
+            run = checkers & start_mask
+            for offset in offsets:
+                run &= checkers >> offset
+            if run:
+                return True
+        return False
+
+    def get_winning_cells(self, checkers, occupied):
+        """
+        Empty cells that would complete a run of win_count checkers of the player.
+        """
+        cells = 0
+        for start_mask, missing, offsets in self.threat_shifts:
+            run = start_mask
+            for offset in offsets:
+                run &= checkers >> offset
+            cells |= run << missing
+        return cells & ~occupied
+
+    def get_playable_cells(self, occupied):
+        # The lowest empty cell of every column; a top checker shifted into the next column
+        # lands in its bottom row, which is playable whenever it is empty anyway
+        return ~occupied & ((occupied << 1) | self.bottom_row_mask) & self.draw_mask
+
+    def get_tactical_cells(self, wins, threats, occupied):
+        """
+        Playable cells worth searching, given the winning cells of the player on move and of the opponent:
+        one immediate win, else the blocks of the opponent's wins, and never a cell right below an opponent's
+        winning cell. When every move loses, the cells before the last filter are kept.
+        """
+        playable = self.get_playable_cells(occupied)
+        cells = wins & playable
+        if cells:
+            return cells & -cells
+        cells = threats & playable or playable
+        safe = cells & ~((threats & ~self.bottom_row_mask) >> 1)
+        return safe or cells
+
+    def count_newly_blocked_masks(self, cell, checkers):
+        # Win masks through the cell that held no checker of the player before it dropped there
+        return sum(1 for mask in self.cell_masks[cell] if not mask & checkers)
+
+
+_geometries = {}
+
+
+def get_geometry(rows=M, cols=N, win_count=WIN_CNT):
+    """
+    Returns the shared geometry of the given dimensions, so its tables are built once per process.
+    """
+    key = (rows, cols, win_count)
+    geometry = _geometries.get(key)
+    if geometry is None:
+        geometry = _geometries.setdefault(key, Geometry(rows, cols, win_count))
+    return geometry
+
+
+DEFAULT_GEOMETRY = get_geometry()
@@ -0,0 +1,119 @@
+import threading
+from collections import OrderedDict
+
+from django.db import IntegrityError
+from django.utils import timezone
+
+from game.models.config import (MOVE_CACHE_SIZE, MOVE_CACHE_DB_SIZE, MOVE_CACHE_EVICTION,
+                                MOVE_CACHE_EVICTION_INTERVAL)
+from game.models.game import BestMove
+
+MOVE_CACHE_EVICTIONS = ("lru", "fifo")
+
+
+def get_move_key(agent_kind, state, depth):
+    """
+    Ključ keša: vrsta agenta, dubina, dimenzije table, igrač na potezu i obe bitborde (heksadecimalno).
+    """
+    rows, cols, win_count = state.geometry.get_dimensions()
+    return (f"{agent_kind}:{depth}:{rows}x{cols}x{win_count}:{state.get_next_on_move()}:"
+            f"{state.checkers_red:x}:{state.checkers_yellow:x}")
+
+
+class MoveCache:
+    """
+    Keš najboljih poteza: LRU u memoriji procesa ispred trajnog nivoa u bazi (model `BestMove`).
+    Pogodak u bazi se prepisuje i u memoriju, pa se ponovljene pozicije čitaju bez upita.
+    """
+    def __init__(self, size=MOVE_CACHE_SIZE, db_size=MOVE_CACHE_DB_SIZE, eviction=MOVE_CACHE_EVICTION,
+                 eviction_interval=MOVE_CACHE_EVICTION_INTERVAL):
+        if eviction not in MOVE_CACHE_EVICTIONS:
+            raise ValueError(f'Unknown move cache eviction {eviction}!')
+        self.size = size
+        self.db_size = db_size
+        self.eviction = eviction
+        self.eviction_interval = eviction_interval
+        self.moves = OrderedDict()
+        self.lock = threading.Lock()
+        self.inserts = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, agent_kind, state, depth):
+        """
+        Vraća zapamćenu kolonu ili None.
+        """
+        key = get_move_key(agent_kind, state, depth)
+        with self.lock:
+            column = self.moves.get(key)
+            if column is not None:
+                if self.eviction == "lru":
+                    self.moves.move_to_end(key)
+                self.hits += 1
+                return column
+        if self.db_size:
+            column = BestMove.objects.filter(key=key).values_list("column", flat=True).first()
+            if column is not None:
+                if self.eviction == "lru":
+                    BestMove.objects.filter(key=key).update(last_used=timezone.now())
+                self.put_memory(key, column)
+                with self.lock:
+                    self.hits += 1
+                return column
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, agent_kind, state, depth, column):
+        key = get_move_key(agent_kind, state, depth)
+        self.put_memory(key, column)
+        if self.db_size:
+            try:
+                BestMove.objects.update_or_create(key=key, defaults={"column": column})
+            except IntegrityError:
+                pass  # Isti potez je istovremeno upisao drugi proces
+            with self.lock:
+                self.inserts += 1
+                evict = self.inserts % self.eviction_interval == 0
+            if evict:
+                self.evict_db()
+
+    def put_memory(self, key, column):
+        if not self.size:
+            return
+        with self.lock:
+            self.moves[key] = column
+            self.moves.move_to_end(key)
+            while len(self.moves) > self.size:
+                self.moves.popitem(last=False)
+
+    def evict_db(self):
+        """
+        Briše najstarije (fifo) ili najduže nekorišćene (lru) poteze iznad `db_size`.
+        """
+        excess = BestMove.objects.count() - self.db_size
+        if excess > 0:
+            order = "last_used" if self.eviction == "lru" else "created"
+            stale = BestMove.objects.order_by(order).values_list("id", flat=True)[:excess]
+            BestMove.objects.filter(id__in=list(stale)).delete()
+
+    def clear(self):
+        with self.lock:
+            self.moves.clear()
+
+    def get_stats(self):
+        with self.lock:
+            return {"size": len(self.moves), "hits": self.hits, "misses": self.misses}
+
+
+_move_cache = None
+
+
+def get_move_cache():
+    """
+    Vraća deljeni keš najboljih poteza, kreira ga pri prvom pozivu.
+    """
+    global _move_cache
+    if _move_cache is None:
+        _move_cache = MoveCache()
+    return _move_cache
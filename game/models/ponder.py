@@ -0,0 +1,179 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from game.models.config import PONDER_REPLIES, PONDER_CACHE_SIZE, PONDER_TTL_SEC, PONDER_MAX_TASKS
+
+
+def get_likely_replies(state):
+    """
+    Odgovori protivnika po verovatnoći: pobede, pa blokade pobeda računara, pa kolone bliže centru.
+    """
+    geometry = state.geometry
+    occupied = state.get_int_state()
+    player = state.get_next_on_move()
+    wins = geometry.get_winning_cells(state.get_checkers(player), occupied)
+    threats = geometry.get_winning_cells(state.get_checkers(1 - player), occupied)
+    heights = state.get_heights()
+
+    def priority(column):
+        cell = 1 << (column * geometry.rows + heights[column])
+        return 0 if wins & cell else 1 if threats & cell else 2, geometry.center_rank[column]
+
+    return sorted(state.get_possible_columns(), key=priority)
+
+
+class Ponderer:
+    """
+    Razmišljanje u vreme protivnika: posle poteza računara pretražuju se verovatni odgovori čoveka,
+    a izabrani potezi čuvaju se po igri, sa rokom trajanja i ukupnim ograničenjem broja pozicija.
+    Kada čovek odigra, pretrage ostalih odgovora se otkazuju; pretraga odigranog odgovora koja je još
+    u toku predaje se sledećem potezu računara.
+    """
+    def __init__(self, replies=PONDER_REPLIES, size=PONDER_CACHE_SIZE, ttl_sec=PONDER_TTL_SEC,
+                 max_tasks=PONDER_MAX_TASKS, executor=None):
+        self.replies = replies
+        self.size = size
+        self.ttl_sec = ttl_sec
+        self.max_tasks = max_tasks
+        self.executor = executor
+        self.games = OrderedDict()  # game_id -> (rok, {(crveni, žuti): kolona})
+        self.positions = 0
+        self.tasks = {}  # game_id -> {(crveni, žuti): zadatak}
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_executor(self):
+        # Deljeni izvršilac se ne pamti, `get_search_executor` ga zamenjuje kada se pokvari
+        if self.executor is None:
+            from game.models.util import get_search_executor
+            return get_search_executor()
+        return self.executor
+
+    def start(self, game_id, agent_kind, state, max_depth=None, time_ms=None):
+        """
+        Pokreće pretrage odgovora na poziciju u kojoj je čovek na potezu; prethodne pretrage igre se otkazuju.
+        """
+        self.drop(game_id)
+        # Pretrage čekaju u istom redu kao potezi računara, pa jedan radni proces uvek ostaje slobodan za njih
+        max_tasks = min(self.max_tasks, self.get_executor().max_workers - 1)
+        for reply in get_likely_replies(state)[:self.replies]:
+            child = state.generate_successor_state(reply)
+            if child.get_state_status() is not None:
+                continue
+            with self.lock:
+                if self.pending >= max_tasks:
+                    break
+                self.pending += 1
+            task = self.get_executor().submit(agent_kind, child, max_depth, time_ms)
+            position = (child.checkers_red, child.checkers_yellow)
+            with self.lock:
+                self.tasks.setdefault(game_id, {})[position] = task
+            task.future.add_done_callback(functools.partial(self.finish, game_id, position, task))
+
+    def finish(self, game_id, position, task, future):
+        with self.lock:
+            tasks = self.tasks.get(game_id)
+            if tasks is None or tasks.get(position) is not task:
+                return  # Pretraga je otkazana ili predata potezu računara
+            del tasks[position]
+            if not tasks:
+                del self.tasks[game_id]
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None or future.result()[0] is None:
+                return
+            expires, moves = self.games.pop(game_id, (time.monotonic() + self.ttl_sec, {}))
+            moves[position] = future.result()[0]
+            self.games[game_id] = (expires, moves)
+            self.positions += 1
+            while self.positions > self.size:
+                _, (_, evicted) = self.games.popitem(last=False)
+                self.positions -= len(evicted)
+
+    def select(self, game_id, state):
+        """
+        Zadržava samo potez i pretragu za poziciju posle odgovora čoveka; ostale pretrage igre se otkazuju.
+        Vraća (kolona, zadatak) za tu poziciju, bez njihovog uklanjanja.
+        """
+        position = (state.checkers_red, state.checkers_yellow)
+        cancelled = []
+        with self.lock:
+            column = None
+            entry = self.games.get(game_id)
+            if entry is not None:
+                expires, moves = entry
+                column = moves.get(position) if expires > time.monotonic() else None
+                self.positions -= len(moves) - (column is not None)
+                if column is None:
+                    del self.games[game_id]
+                else:
+                    self.games[game_id] = (expires, {position: column})
+            tasks = self.tasks.get(game_id, {})
+            task = tasks.get(position)
+            for other, other_task in list(tasks.items()):
+                if other != position:
+                    del tasks[other]
+                    cancelled.append(other_task)
+            if not tasks:
+                self.tasks.pop(game_id, None)
+            self.pending -= len(cancelled)
+        for other_task in cancelled:
+            other_task.cancel()
+        return column, task
+
+    def take(self, game_id, state):
+        """
+        Vraća (kolona, None) ako je odgovor računara pripremljen, (None, zadatak) ako je njegova pretraga
+        još u toku ili (None, None); igra se zatim briše iz razmišljanja.
+        """
+        column, task = self.select(game_id, state)
+        with self.lock:
+            entry = self.games.pop(game_id, None)
+            if entry is not None:
+                self.positions -= len(entry[1])
+            # Pretraga u toku se predaje pozivaocu, pa se više ne vodi kao razmišljanje
+            tasks = self.tasks.pop(game_id, {})
+            self.pending -= len(tasks)
+            if column is not None or task is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if column is not None:
+            for other_task in tasks.values():
+                other_task.cancel()
+            return column, None
+        return None, task
+
+    def drop(self, game_id):
+        """
+        Otkazuje pretrage igre i briše njene pripremljene poteze.
+        """
+        with self.lock:
+            entry = self.games.pop(game_id, None)
+            if entry is not None:
+                self.positions -= len(entry[1])
+            tasks = self.tasks.pop(game_id, {})
+            self.pending -= len(tasks)
+        for task in tasks.values():
+            task.cancel()
+
+    def get_stats(self):
+        with self.lock:
+            return {"games": len(self.games), "positions": self.positions, "pending": self.pending,
+                    "hits": self.hits, "misses": self.misses}
+
+
+_ponderer = None
+
+
+def get_ponderer():
+    """
+    Vraća deljeni `Ponderer`, kreira ga pri prvom pozivu.
+    """
+    global _ponderer
+    if _ponderer is None:
+        _ponderer = Ponderer()
+    return _ponderer
@@ -1,62 +1,32 @@
-from .config import M, N, WIN_CNT
+from .geometry import DEFAULT_GEOMETRY
 
 
 class State:
-    @staticmethod
-    def get_all_win_states():
-        win_indexes = []
-
-        # Column wins
-        indexes = filter(lambda sub_l: len(set(s // M for s in sub_l if s < M * N)) == 1,
-                         [[i + j for j in range(WIN_CNT)]
-                          for i in range(M * N - WIN_CNT + 1)])
-        win_indexes.extend(indexes)
-
-        # Row wins
-        indexes = filter(lambda sub_l: len(sub_l) == len([s for s in sub_l if s < M * N]),
-                         [[j * M + i for j in range(WIN_CNT)]
-                          for i in range(M * N - WIN_CNT + 1)])
-        win_indexes.extend(indexes)
-
-        # Main diagonal wins
-        indexes = filter(lambda sub_l: (length := len(sub_l)) == len(
-            ind := set(s // M for s in sub_l if s < M * N)) and length == len(
-            range(min(ind), max(ind) + 1)),
-                         [[j * (M - 1) + i for j in range(WIN_CNT)]
-                          for i in range(M * N - WIN_CNT + 1)])
-        win_indexes.extend(indexes)
-
-        # Anti-diagonal wins
-        indexes = filter(lambda sub_l: (length := len(sub_l)) == len(
-            ind := set(s // M for s in sub_l if s < M * N)) and length == len(
-            range(min(ind), max(ind) + 1)),
-                         [[j * (M + 1) + i for j in range(WIN_CNT)]
-                          for i in range(M * N - WIN_CNT + 1)])
-        win_indexes.extend(indexes)
-
-        win_masks_set = set()
-        for sub_list in win_indexes:
-            win_mask = 0
-            for sub in sub_list:
-                win_mask |= 1 << sub
-            win_masks_set.add(win_mask)
-        return win_masks_set
-
-    DRAW_MASK = (1 << (M * N)) - 1
-    win_masks = get_all_win_states()
+    __slots__ = ("geometry", "checkers_red", "checkers_yellow", "next_on_move", "_status", "_free_masks",
+                 "_heights", "_moves", "_blocked")
     RED = 0
     YEL = 1
     DRAW = 2
+    _UNKNOWN = -1
 
-    def __init__(self):
-        self.checkers_red = 0 & State.DRAW_MASK
-        self.checkers_yellow = 0 & State.DRAW_MASK
+    def __init__(self, geometry=None):
+        # The geometry (board size and win length) is shared by all states of a game
+        self.geometry = geometry if geometry is not None else DEFAULT_GEOMETRY
+        self.checkers_red = 0
+        self.checkers_yellow = 0
         self.next_on_move = State.RED
+        self._status = State._UNKNOWN
+        self._free_masks = None
+        self._heights = None
+        # Undo records of make_move: the columns played and the masks each move blocked
+        self._moves = None
+        self._blocked = None
 
     def __str__(self):
-        return '\n'.join([' '.join(['X' if ((mask := 1 << (i + j * M)) & self.checkers_red) == mask else
-                                    'O' if (mask & self.checkers_yellow) == mask else '_' for j in range(N)])
-                          for i in range(M - 1, -1, -1)])
+        rows, cols = self.geometry.rows, self.geometry.cols
+        return '\n'.join([' '.join(['X' if ((mask := 1 << (i + j * rows)) & self.checkers_red) == mask else
+                                    'O' if (mask & self.checkers_yellow) == mask else '_' for j in range(cols)])
+                          for i in range(rows - 1, -1, -1)])
 
     def get_checkers(self, ident):
         if ident == State.RED:
@@ -72,79 +42,179 @@ class State:
     def get_next_on_move(self):
         return self.next_on_move
 
+    def get_key(self):
+        # Unique position key: every column is stored in rows + 1 bits as its red checkers
+        # plus a marker bit just above the top checker
+        key = 0
+        rows = self.geometry.rows
+        column_mask = self.geometry.column_mask
+        state_int = self.get_int_state()
+        for col in range(self.geometry.cols):
+            occupied = (state_int >> (col * rows)) & column_mask
+            red = (self.checkers_red >> (col * rows)) & column_mask
+            key |= (red | (occupied + 1)) << (col * (rows + 1))
+        return key
+
     def get_state_status(self):
-        if self.get_int_state() == State.DRAW_MASK:
-            return State.DRAW
-        for mask in self.win_masks:
-            if (self.checkers_red & mask) == mask:
-                return State.RED
-            if (self.checkers_yellow & mask) == mask:
-                return State.YEL
-        return None
+        if self._status == State._UNKNOWN:
+            if self.get_int_state() == self.geometry.draw_mask:
+                self._status = State.DRAW
+            elif self.geometry.is_win(self.checkers_red):
+                self._status = State.RED
+            elif self.geometry.is_win(self.checkers_yellow):
+                self._status = State.YEL
+            else:
+                self._status = None
+        return self._status
 
     def get_win_checkers_positions(self):
         positions = []
         if self.get_state_status() is not None:
-            for mask in self.win_masks:
+            rows = self.geometry.rows
+            for mask in self.geometry.win_masks:
                 if (self.checkers_red & mask) == mask or (self.checkers_yellow & mask) == mask:
                     while mask:
                         temp = mask & -mask
                         pos = temp.bit_length() - 1
-                        positions.append((M - 1 - pos % M, pos // M))
+                        positions.append((rows - 1 - pos % rows, pos // rows))
                         mask ^= temp
                     break
         return positions
 
+    def get_free_masks(self, ident):
+        """
+        Number of win masks that contain no checker of the given player.
+        """
+        if self._free_masks is None:
+            win_masks = self.geometry.win_masks
+            self._free_masks = [sum(1 for mask in win_masks if not mask & self.checkers_red),
+                                sum(1 for mask in win_masks if not mask & self.checkers_yellow)]
+        return self._free_masks[ident]
+
     def get_possible_columns(self):
-        state_int = self.get_int_state()
-        mask = 1 << (M - 1)
-        possible_columns = []
-        for col in range(N):
-            if not (state_int & mask):
-                possible_columns.append(col)
-            mask <<= M
-        return possible_columns
+        # The free top cells select a memoised tuple of columns
+        return self.geometry.get_free_columns(self.geometry.top_row_mask & ~self.get_int_state())
+
+    def get_heights(self):
+        """
+        Number of checkers in every column, kept up to date by the moves.
+        """
+        if self._heights is None:
+            rows = self.geometry.rows
+            column_mask = self.geometry.column_mask
+            state_int = self.get_int_state()
+            self._heights = [((state_int >> (col * rows)) & column_mask).bit_length()
+                             for col in range(self.geometry.cols)]
+        return self._heights
+
+    def copy(self):
+        # Every field is set here, so the constructor is skipped
+        state = State.__new__(State)
+        state.geometry = self.geometry
+        state.checkers_red = self.checkers_red
+        state.checkers_yellow = self.checkers_yellow
+        state.next_on_move = self.next_on_move
+        state._status = self._status
+        state._free_masks = self._free_masks.copy() if self._free_masks is not None else None
+        state._heights = self._heights.copy() if self._heights is not None else None
+        state._moves = None
+        state._blocked = None
+        return state
 
-    def generate_successor_state(self, column):
+    def play(self, column):
+        """
+        Drops a checker of the player on move into the column in place.
+        Returns the number of win masks the move blocked for that player.
+        """
         if self.get_state_status() is not None:
             raise Exception(f'State is finite!\n{self}')
-        if column is None or column < 0 or column >= N:
-            raise Exception(f'Column {column} out of bounds [0 - {N - 1}]!')
-        copy_state = State()
-        copy_state.checkers_red = self.checkers_red
-        copy_state.checkers_yellow = self.checkers_yellow
-        state_int = self.get_int_state()
-        mask = 1 << (column * M)
-        for _ in range(M):
-            if not (state_int & mask):
-                if self.next_on_move == State.RED:
-                    copy_state.checkers_red |= mask
-                else:
-                    copy_state.checkers_yellow |= mask
-                copy_state.next_on_move = State.YEL if self.next_on_move == State.RED else State.RED
-                return copy_state
-            mask <<= 1
-        raise Exception(f'Column {column} is full!\n{self}')
+        geometry = self.geometry
+        if column is None or column < 0 or column >= geometry.cols:
+            raise Exception(f'Column {column} out of bounds [0 - {geometry.cols - 1}]!')
+        heights = self.get_heights()
+        height = heights[column]
+        if height >= geometry.rows:
+            raise Exception(f'Column {column} is full!\n{self}')
+        heights[column] = height + 1
+        cell = column * geometry.rows + height
+        mask = 1 << cell
+        player = self.next_on_move
+        # Only the masks through the dropped checker change
+        free_masks = self._free_masks
+        if free_masks is None:
+            self.get_free_masks(player)
+            free_masks = self._free_masks
+        if player == State.RED:
+            blocked = geometry.count_newly_blocked_masks(cell, self.checkers_red)
+            self.checkers_red |= mask
+            checkers = self.checkers_red
+            self.next_on_move = State.YEL
+        else:
+            blocked = geometry.count_newly_blocked_masks(cell, self.checkers_yellow)
+            self.checkers_yellow |= mask
+            checkers = self.checkers_yellow
+            self.next_on_move = State.RED
+        free_masks[player] -= blocked
+        # Only the player who just moved can have completed a win
+        if self.checkers_red | self.checkers_yellow == geometry.draw_mask:
+            self._status = State.DRAW
+        elif geometry.is_win(checkers):
+            self._status = player
+        else:
+            self._status = None
+        return blocked
+
+    def make_move(self, column):
+        """
+        Plays the column in place; unmake_move() takes it back.
+        """
+        blocked = self.play(column)
+        if self._moves is None:
+            self._moves = []
+            self._blocked = []
+        self._moves.append(column)
+        self._blocked.append(blocked)
+
+    def unmake_move(self):
+        """
+        Takes back the last move of make_move().
+        """
+        column = self._moves.pop()
+        blocked = self._blocked.pop()
+        heights = self._heights
+        height = heights[column] - 1
+        heights[column] = height
+        mask = ~(1 << (column * self.geometry.rows + height))
+        # A move can only be made from an unfinished state
+        self._status = None
+        if self.next_on_move == State.RED:
+            self.next_on_move = State.YEL
+            self.checkers_yellow &= mask
+        else:
+            self.next_on_move = State.RED
+            self.checkers_red &= mask
+        self._free_masks[self.next_on_move] += blocked
+
+    def generate_successor_state(self, column):
+        """
+        Returns a new state with the column played; the searches use make_move()/unmake_move() instead.
+        """
+        state = self.copy()
+        state.play(column)
+        return state
 
     def get_column_height(self, column):
-        if column is None or column < 0 or column >= N:
-            raise Exception(f'Column {column} out of bounds [0 - {N - 1}]!')
-        state = self.get_int_state()
-        mask = 1 << (column * M)
-        height = 0
-        for _ in range(M):
-            if state & mask:
-                height += 1
-            else:
-                break
-            mask <<= 1
-        return height
+        cols = self.geometry.cols
+        if column is None or column < 0 or column >= cols:
+            raise Exception(f'Column {column} out of bounds [0 - {cols - 1}]!')
+        return self.get_heights()[column]
 
     def to_dict(self):
-        board = [[0 for _ in range(N)] for _ in range(M)]
-        for i in range(M):
-            for j in range(N):
-                mask = 1 << (i + j * M)
+        rows, cols = self.geometry.rows, self.geometry.cols
+        board = [[0 for _ in range(cols)] for _ in range(rows)]
+        for i in range(rows):
+            for j in range(cols):
+                mask = 1 << (i + j * rows)
                 if (self.checkers_red & mask) == mask:
                     board[i][j] = 1  # Red checker
                 elif (self.checkers_yellow & mask) == mask:
@@ -155,16 +225,25 @@ class State:
         }
 
     @staticmethod
-    def from_dict(data):
-        state = State()
+    def from_bitboards(checkers_red, checkers_yellow, next_on_move, geometry=None):
+        state = State(geometry)
+        state.checkers_red = checkers_red
+        state.checkers_yellow = checkers_yellow
+        state.next_on_move = next_on_move
+        return state
+
+    @staticmethod
+    def from_dict(data, geometry=None):
+        state = State(geometry)
+        rows, cols = state.geometry.rows, state.geometry.cols
         board = data.get("board", [])
-        for i in range(M):
-            for j in range(N):
+        for i in range(rows):
+            for j in range(cols):
                 if board[i][j] == 1:  # Red checker
-                    mask = 1 << (i + j * M)
+                    mask = 1 << (i + j * rows)
                     state.checkers_red |= mask
                 elif board[i][j] == 2:  # Yellow checker
-                    mask = 1 << (i + j * M)
+                    mask = 1 << (i + j * rows)
                     state.checkers_yellow |= mask
         state.next_on_move = data.get("next_on_move", State.RED)
         return state
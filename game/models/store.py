@@ -0,0 +1,257 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+from game.models.config import GAME_STORE_BACKEND, GAME_STORE_SIZE, GAME_STORE_TTL_SEC
+from game.models.game import Game
+from game.models.geometry import DEFAULT_GEOMETRY, get_geometry
+from game.models.state import State
+
+class StaleGame(Exception):
+    """Izuzetak kada je igra u međuvremenu promenjena drugim potezom."""
+    pass
+
+
+# Every move is one character: the column index in base 36
+MOVE_CHARS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def encode_moves(columns):
+    return "".join(MOVE_CHARS[column] for column in columns)
+
+
+def decode_moves(moves):
+    columns = []
+    for char in moves:
+        if char not in MOVE_CHARS:
+            raise ValueError(f'Invalid move {char!r} in move string!')
+        columns.append(MOVE_CHARS.index(char))
+    return columns
+
+
+def encode_move_ms(values):
+    """
+    Vremena poteza u ms, svako završeno zarezom; potez čoveka je prazan unos (npr. ",12.5,").
+    """
+    return "".join(("" if value is None else str(value)) + "," for value in values)
+
+
+def decode_move_ms(text):
+    return [float(value) if value else None for value in text.split(",")[:-1]]
+
+
+def get_move_bits(cols):
+    return max(1, (cols - 1).bit_length())
+
+
+def pack_moves(columns, cols):
+    """
+    Potezi spakovani po bitovima (3 bita po potezu za 7 kolona): prvi bajt je broj poteza,
+    zatim potezi redom od najnižih bitova.
+    """
+    bits = get_move_bits(cols)
+    packed = 0
+    for i, column in enumerate(columns):
+        packed |= column << (i * bits)
+    return bytes([len(columns)]) + packed.to_bytes((len(columns) * bits + 7) // 8, "little")
+
+
+def unpack_moves(data, cols):
+    data = bytes(data)
+    if not data:
+        return []
+    bits = get_move_bits(cols)
+    packed = int.from_bytes(data[1:], "little")
+    mask = (1 << bits) - 1
+    return [(packed >> (i * bits)) & mask for i in range(data[0])]
+
+
+class GameRecord:
+    """
+    Kompaktan zapis igre: podešavanja igrača, geometrija table, obe bitborde, igrač na potezu, niz poteza
+    i vreme razmišljanja računara za svaki potez (None za poteze čoveka).
+    """
+    def __init__(self, game_id, red_agent, yellow_agent, max_depth=None, time_ms=None,
+                 checkers_red=0, checkers_yellow=0, next_on_move=State.RED, moves="", geometry=None, move_ms=None):
+        self.game_id = game_id
+        self.red_agent = red_agent
+        self.yellow_agent = yellow_agent
+        self.max_depth = max_depth
+        self.time_ms = time_ms
+        self.checkers_red = checkers_red
+        self.checkers_yellow = checkers_yellow
+        self.next_on_move = next_on_move
+        self.moves = moves
+        self.geometry = geometry if geometry is not None else DEFAULT_GEOMETRY
+        self.move_ms = move_ms if move_ms is not None else []
+        self.search_ms = None  # Vreme pretrage sledećeg poteza, postavlja ga `set_search_time`
+
+    def copy(self):
+        return GameRecord(self.game_id, self.red_agent, self.yellow_agent, self.max_depth, self.time_ms,
+                          self.checkers_red, self.checkers_yellow, self.next_on_move, self.moves, self.geometry,
+                          list(self.move_ms))
+
+    def get_state(self):
+        return State.from_bitboards(self.checkers_red, self.checkers_yellow, self.next_on_move, self.geometry)
+
+    def set_search_time(self, elapsed_time):
+        self.search_ms = round(elapsed_time * 1000, 3)
+
+    def play(self, column, state):
+        """
+        Beleži odigrani potez, vreme njegove pretrage i novo stanje.
+        """
+        self.checkers_red = state.checkers_red
+        self.checkers_yellow = state.checkers_yellow
+        self.next_on_move = state.get_next_on_move()
+        self.moves += MOVE_CHARS[column]
+        self.move_ms.append(self.search_ms)
+        self.search_ms = None
+
+    def to_compact(self):
+        """
+        Kompaktan format za klijente: niz poteza i obe bitborde umesto 2D table.
+        Bitborde su decimalni stringovi, JSON broj u JavaScript-u gubi bitove iznad 2^53.
+        """
+        rows, cols, win_count = self.geometry.get_dimensions()
+        return {
+            "rows": rows,
+            "cols": cols,
+            "win_count": win_count,
+            "moves": self.moves,
+            "red": str(self.checkers_red),
+            "yellow": str(self.checkers_yellow),
+            "next_on_move": self.next_on_move,
+        }
+
+
+class MemoryGameStore:
+    """
+    LRU skladište igara u memoriji procesa; igre nisu deljene između radnih procesa.
+    Čuvaju se i vraćaju kopije zapisa, pa potez postaje vidljiv tek sa `save_move`.
+    """
+    def __init__(self, capacity=GAME_STORE_SIZE):
+        self.capacity = capacity
+        self.games = OrderedDict()
+        self.lock = threading.Lock()
+
+    def create(self, record):
+        record.game_id = uuid.uuid4().hex
+        with self.lock:
+            self.games[record.game_id] = record.copy()
+            if len(self.games) > self.capacity:
+                self.games.popitem(last=False)
+        return record
+
+    def load(self, game_id):
+        with self.lock:
+            record = self.games.get(game_id)
+            if record is None:
+                return None
+            self.games.move_to_end(game_id)
+            return record.copy()
+
+    def save_move(self, record, column):
+        with self.lock:
+            stored = self.games.get(record.game_id)
+            if stored is None or stored.moves != record.moves[:-1]:
+                raise StaleGame("Game was changed by another move.")
+            self.games[record.game_id] = record.copy()
+
+
+class CacheGameStore:
+    """
+    Skladište igara u Django kešu; podešavanja i pozicija se čuvaju pod odvojenim ključevima,
+    pa se po potezu upisuje samo pozicija. Svaki potez prvo zauzima svoj redni broj atomskim `cache.add`,
+    pa od dva istovremena poteza na istu poziciju prolazi samo jedan.
+    """
+    def create(self, record):
+        record.game_id = uuid.uuid4().hex
+        cache.set_many({
+            f"game:{record.game_id}:settings": (record.red_agent, record.yellow_agent, record.max_depth,
+                                                record.time_ms, record.geometry.get_dimensions()),
+            f"game:{record.game_id}:position": (record.checkers_red, record.checkers_yellow,
+                                                record.next_on_move, record.moves, record.move_ms),
+        }, GAME_STORE_TTL_SEC)
+        return record
+
+    def load(self, game_id):
+        values = cache.get_many([f"game:{game_id}:settings", f"game:{game_id}:position"])
+        if len(values) != 2:
+            return None
+        red_agent, yellow_agent, max_depth, time_ms, dimensions = values[f"game:{game_id}:settings"]
+        checkers_red, checkers_yellow, next_on_move, moves, move_ms = values[f"game:{game_id}:position"]
+        return GameRecord(game_id, red_agent, yellow_agent, max_depth, time_ms, checkers_red, checkers_yellow,
+                          next_on_move, moves, get_geometry(*dimensions), move_ms)
+
+    def save_move(self, record, column):
+        position = cache.get(f"game:{record.game_id}:position")
+        if position is None or position[3] != record.moves[:-1] or \
+                not cache.add(f"game:{record.game_id}:move:{len(record.moves)}", column, GAME_STORE_TTL_SEC):
+            raise StaleGame("Game was changed by another move.")
+        cache.set(f"game:{record.game_id}:position", (record.checkers_red, record.checkers_yellow,
+                                                      record.next_on_move, record.moves, record.move_ms),
+                  GAME_STORE_TTL_SEC)
+
+
+class DatabaseGameStore:
+    """
+    Skladište igara u bazi; po potezu se ažuriraju samo bitborde i dodaju potez i njegovo vreme.
+    """
+    def create(self, record):
+        record.game_id = uuid.uuid4().hex
+        rows, cols, win_count = record.geometry.get_dimensions()
+        Game.objects.create(game_id=record.game_id, red_agent=record.red_agent, yellow_agent=record.yellow_agent,
+                            max_depth=record.max_depth, time_ms=record.time_ms,
+                            rows=rows, cols=cols, win_count=win_count,
+                            checkers_red=format(record.checkers_red, "x"),
+                            checkers_yellow=format(record.checkers_yellow, "x"),
+                            next_on_move=record.next_on_move, moves=record.moves,
+                            move_ms=encode_move_ms(record.move_ms))
+        return record
+
+    def load(self, game_id):
+        game = Game.objects.filter(game_id=game_id).first()
+        if game is None:
+            return None
+        return GameRecord(game.game_id, game.red_agent, game.yellow_agent, game.max_depth, game.time_ms,
+                          int(game.checkers_red, 16), int(game.checkers_yellow, 16), game.next_on_move, game.moves,
+                          get_geometry(game.rows, game.cols, game.win_count), decode_move_ms(game.move_ms))
+
+    def save_move(self, record, column):
+        # Potez se upisuje samo ako igra nije promenjena posle učitavanja, pa od dva istovremena poteza
+        # (dvostruki klik, strim i običan zahtev) prolazi samo jedan
+        updated = Game.objects.filter(game_id=record.game_id, moves=record.moves[:-1]).update(
+            checkers_red=format(record.checkers_red, "x"),
+            checkers_yellow=format(record.checkers_yellow, "x"),
+            next_on_move=record.next_on_move,
+            moves=Concat(F("moves"), Value(MOVE_CHARS[column])),
+            move_ms=Concat(F("move_ms"), Value(encode_move_ms(record.move_ms[-1:]))),
+        )
+        if not updated:
+            raise StaleGame("Game was changed by another move.")
+
+
+GAME_STORE_BACKENDS = {
+    "memory": MemoryGameStore,
+    "cache": CacheGameStore,
+    "db": DatabaseGameStore,
+}
+
+_game_store = None
+
+
+def get_game_store():
+    """
+    Vraća deljeno skladište igara izabrano sa `GAME_STORE_BACKEND`.
+    """
+    global _game_store
+    if _game_store is None:
+        if GAME_STORE_BACKEND not in GAME_STORE_BACKENDS:
+            raise ValueError(f'Unknown game store backend {GAME_STORE_BACKEND}!')
+        _game_store = GAME_STORE_BACKENDS[GAME_STORE_BACKEND]()
+    return _game_store
@@ -1,7 +1,16 @@
-import ctypes
+import asyncio
+import itertools
+import threading
 import time
-from threading import Timer, Thread
-from queue import Queue
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Array
+
+from game.agents.agents import MinimaxABAgent, NegascoutAgent, CompetitiveAgent, SearchTimeout
+from game.agents.stats import SearchStats
+from game.models.config import SEARCH_WORKERS, SEARCH_QUEUE_SIZE
+from game.models.geometry import get_geometry
+from game.models.state import State
+from game.worker import init_process
 
 
 class Timeout(Exception):
@@ -9,49 +18,326 @@ class Timeout(Exception):
     pass
 
 
-def send_thread_exception(*args):
+class SearchQueueFull(Exception):
+    """Izuzetak kada je red pretraga pun i nova pretraga se odbija."""
+    pass
+
+
+CANCEL_SLOTS = 1024
+
+# Stanje radnog procesa, postavlja ga `init_worker`
+_worker_agents = {}
+_worker_roots = {}  # agent_kind -> (geometrija, crveni, žuti) poslednje pretražene pozicije
+_worker_cancel_flags = None
+
+
+AGENT_CLASSES = {
+    "minimax": MinimaxABAgent,
+    "negascout": NegascoutAgent,
+    "competitive": CompetitiveAgent,
+}
+AGENT_KINDS = tuple(AGENT_CLASSES)
+
+
+def create_agent(agent_kind):
+    """
+    Kreira agenta zadate vrste.
+    """
+    if agent_kind not in AGENT_CLASSES:
+        raise ValueError(f'Unknown agent kind {agent_kind}!')
+    return AGENT_CLASSES[agent_kind]()
+
+
+def init_worker(cancel_flags):
+    """
+    Zagreva radni proces: kreira agente (i njihove transpozicione tabele) jednom po procesu.
+    """
+    global _worker_cancel_flags
+    _worker_cancel_flags = cancel_flags
+    for agent_kind in AGENT_KINDS:
+        _worker_agents[agent_kind] = create_agent(agent_kind)
+
+
+def get_worker_agent(agent_kind, state):
+    """
+    Vraća agenta radnog procesa za pretragu stanja. Tabele agenta ostaju dok pozicije prate istu igru
+    (nova pozicija samo dodaje žetone prethodnoj), a brišu se kada pretraga pređe na drugu igru,
+    da tabele i redosled poteza ne bi nosili pozicije ranijih igara.
+    """
+    agent = _worker_agents.get(agent_kind)
+    if agent is None:
+        agent = _worker_agents[agent_kind] = create_agent(agent_kind)
+    root = _worker_roots.get(agent_kind)
+    if root is not None and (root[0] is not state.geometry or root[1] & ~state.checkers_red or
+                             root[2] & ~state.checkers_yellow):
+        agent.clear_tables()
+    _worker_roots[agent_kind] = (state.geometry, state.checkers_red, state.checkers_yellow)
+    return agent
+
+
+def run_search(agent_kind, dimensions, checkers_red, checkers_yellow, next_on_move, max_depth, time_ms, slot,
+               collect_stats=False):
+    """
+    Izvršava pretragu u radnom procesu uz kooperativne rokove.
+    Vraća (kolona, proteklo_vreme, broj_čvorova, statistika); kolona je None ako je pretraga otkazana,
+    a statistika rečnik `SearchStats.to_dict()` ili None ako nije tražena.
+    """
+    state = State.from_bitboards(checkers_red, checkers_yellow, next_on_move, get_geometry(*dimensions))
+    agent = get_worker_agent(agent_kind, state)
+
+    cancel_flags = _worker_cancel_flags
+    agent.set_stop_check((lambda: cancel_flags[slot] != 0) if cancel_flags is not None else None)
+    stats = SearchStats() if collect_stats else None
+    agent.set_stats(stats)
+    nodes_before = agent.nodes
+    start_time = time.perf_counter()
+    try:
+        column = agent.get_chosen_column(state, max_depth, time_ms)
+    except SearchTimeout:
+        column = None
+    finally:
+        agent.set_stop_check(None)
+        agent.set_stats(None)
+    elapsed_time = time.perf_counter() - start_time
+    if cancel_flags is not None and cancel_flags[slot]:
+        column = None
+    nodes = agent.nodes - nodes_before
+    if stats is not None:
+        # Ukupan broj čvorova obuhvata i dubinu prekinutu istekom roka
+        stats.nodes = nodes
+        stats = stats.to_dict()
+    return column, elapsed_time, nodes, stats
+
+
+def run_search_depth(agent_kind, dimensions, checkers_red, checkers_yellow, next_on_move, depth, first_column, slot):
     """
-    Šalje izuzetak niti koja je prekoračila vremensko ograničenje.
+    Izvršava jednu dubinu iterativnog produbljivanja u radnom procesu, za strimovanje napretka pretrage.
+    Vraća (kolona, vrednost, izvor, proteklo_vreme, broj_čvorova); kolona je None ako je pretraga otkazana.
+    Na dubini 1 poziciju prvo traže knjiga otvaranja i rešavač; tada je izvor "book" ili "solver", a vrednost None.
     """
-    for t_id in args:
-        res = ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_long(t_id), ctypes.py_object(Timeout))
-        if not res:
-            print(f"Greška: Niti {t_id} nije pronađena")
-        if res > 1:
-            ctypes.pythonapi.PyThreadState_SetAsyncExc(t_id, 0)
-            print(f"Greška: Nije uspelo slanje izuzetka za niti {t_id}")
+    state = State.from_bitboards(checkers_red, checkers_yellow, next_on_move, get_geometry(*dimensions))
+    agent = get_worker_agent(agent_kind, state)
+
+    cancel_flags = _worker_cancel_flags
+    agent.set_stop_check((lambda: cancel_flags[slot] != 0) if cancel_flags is not None else None)
+    nodes_before = agent.nodes
+    start_time = time.perf_counter()
+    value, column, source = None, None, None
+    try:
+        if depth == 1:
+            agent.start_search(state)
+            column, source = agent.get_exact_column(state)
+        if column is None:
+            # Dubine istog strima stižu u bilo koji radni proces, a CompetitiveAgent bira podagenta po parnosti
+            # dubine, pa tabela pomaže samo kada ranija dubina iste parnosti prođe kroz isti proces
+            value, column = agent.search(state, depth, first_column)
+            source = "search"
+    except SearchTimeout:
+        column = None
+    finally:
+        agent.set_stop_check(None)
+    elapsed_time = time.perf_counter() - start_time
+    if cancel_flags is not None and cancel_flags[slot]:
+        column = None
+    return column, value, source, elapsed_time, agent.nodes - nodes_before
 
 
-class TimedFunction(Thread):
+def run_analysis(agent_kind, dimensions, checkers_red, checkers_yellow, next_on_move, max_depth, time_ms, slot):
     """
-    Izvršava funkciju u određenom vremenskom ograničenju.
-    Ako funkcija prekorači vremensko ograničenje, baca se `Timeout` izuzetak.
+    Ocenjuje sve moguće kolone pozicije u radnom procesu, vidi `Agent.analyze`.
+    Vraća (ocene, najbolja_kolona, dubina, proteklo_vreme, broj_čvorova); ocene su None ako je analiza otkazana.
+    Agenti radnog procesa se ne prave iznova, pa transpoziciona tabela ostaje topla između uzastopnih pozicija
+    iste igre, vidi `get_worker_agent`.
     """
-    def __init__(self, queue: Queue, max_time_sec: int, method, *args):
-        super().__init__()
-        self.queue = queue
-        self.max_time_sec = max_time_sec
-        self.method = method
-        self.args = args
+    geometry = get_geometry(*dimensions)
+    state = State.from_bitboards(checkers_red, checkers_yellow, next_on_move, geometry)
+    agent = get_worker_agent(agent_kind, state)
+
+    cancel_flags = _worker_cancel_flags
+    agent.set_stop_check((lambda: cancel_flags[slot] != 0) if cancel_flags is not None else None)
+    nodes_before = agent.nodes
+    start_time = time.perf_counter()
+    try:
+        scores, depth = agent.analyze(state, max_depth, time_ms)
+    except SearchTimeout:
+        scores, depth = None, None
+    finally:
+        agent.set_stop_check(None)
+    elapsed_time = time.perf_counter() - start_time
+    if cancel_flags is not None and cancel_flags[slot]:
+        scores = None
+    best_column = None
+    if scores:
+        # Najbolja je kolona koju bi izabrala i pretraga: potezi koji odmah gube se ne biraju,
+        # a jednake ocene razrešava blizina centra
+        columns = [col for col in agent.get_tactical_columns(state) if col in scores]
+        best_column = min(columns, key=lambda col: (-scores[col], geometry.center_rank[col]))
+    return scores, best_column, depth, elapsed_time, agent.nodes - nodes_before
+
 
-    def run(self) -> None:
+class SearchTask:
+    """
+    Ručka za pretragu pokrenutu u `SearchExecutor`-u.
+    """
+    def __init__(self, future, cancel_flags, slot):
+        self.future = future
+        self.cancel_flags = cancel_flags
+        self.slot = slot
+
+    def cancel(self):
         """
-        Izvršava zadatu metodu uz poštovanje vremenskog ograničenja.
+        Otkazuje pretragu; pretraga koja je već u toku se zaustavlja na sledećoj proveri roka.
+        Završena pretraga se ne dira, njeno mesto u `cancel_flags` možda već koristi druga pretraga.
         """
-        timer = None
-        if self.max_time_sec:
-            timer = Timer(self.max_time_sec, send_thread_exception, [self.ident])
-            timer.start()
+        if self.future.done():
+            return
+        if not self.future.cancel():
+            self.cancel_flags[self.slot] = 1
 
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Vraća (kolona, proteklo_vreme, broj_čvorova, statistika) ili baca `Timeout` ako je pretraga otkazana.
+        """
+        if self.future.cancelled():
+            raise Timeout()
+        result = self.future.result(timeout)
+        if result[0] is None:
+            raise Timeout()
+        return result
+
+    async def aresult(self):
+        """
+        Asinhrona verzija `result`; otkazivanje korutine otkazuje i pretragu.
+        """
         try:
-            start_time = time.time()
-            result = self.method(*self.args)
-            elapsed_time = time.time() - start_time
-            self.queue.put((result, elapsed_time), block=False)
-        except Timeout:
-            self.queue.put(("Timeout", None), block=False)
-        except Exception as e:
-            self.queue.put((e, None), block=False)
+            result = await asyncio.wrap_future(self.future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        if result[0] is None:
+            raise Timeout()
+        return result
+
+
+class SearchExecutor:
+    """
+    Izvršava pretrage u skupu unapred zagrejanih procesa.
+    Vremenska ograničenja se poštuju kooperativno, proverama roka unutar rekurzije agenata.
+    """
+    def __init__(self, max_workers=SEARCH_WORKERS, mp_context=None):
+        self.max_workers = max_workers
+        self.cancel_flags = Array('b', CANCEL_SLOTS, lock=False)
+        self.slots = itertools.count()
+        # Proces pokrenut sa "spawn" ili "forkserver" prvo podešava Django, vidi `init_process`
+        self.pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=init_process,
+                                        initargs=("game.models.util.init_worker", self.cancel_flags))
+
+    def submit(self, agent_kind, state, max_depth=None, time_ms=None, collect_stats=False):
+        slot = next(self.slots) % CANCEL_SLOTS
+        self.cancel_flags[slot] = 0
+        future = self.pool.submit(run_search, agent_kind, state.geometry.get_dimensions(), state.checkers_red,
+                                  state.checkers_yellow, state.get_next_on_move(), max_depth, time_ms, slot,
+                                  collect_stats)
+        return SearchTask(future, self.cancel_flags, slot)
+
+    def submit_depth(self, agent_kind, state, depth, first_column=None):
+        """
+        Pokreće pretragu jedne dubine, vidi `run_search_depth`.
+        """
+        slot = next(self.slots) % CANCEL_SLOTS
+        self.cancel_flags[slot] = 0
+        future = self.pool.submit(run_search_depth, agent_kind, state.geometry.get_dimensions(), state.checkers_red,
+                                  state.checkers_yellow, state.get_next_on_move(), depth, first_column, slot)
+        return SearchTask(future, self.cancel_flags, slot)
+
+    def submit_analysis(self, agent_kind, state, max_depth=None, time_ms=None):
+        """
+        Pokreće analizu svih kolona pozicije, vidi `run_analysis`.
+        """
+        slot = next(self.slots) % CANCEL_SLOTS
+        self.cancel_flags[slot] = 0
+        future = self.pool.submit(run_analysis, agent_kind, state.geometry.get_dimensions(), state.checkers_red,
+                                  state.checkers_yellow, state.get_next_on_move(), max_depth, time_ms, slot)
+        return SearchTask(future, self.cancel_flags, slot)
+
+    def run(self, agent_kind, state, max_depth=None, time_ms=None, timeout=None, collect_stats=False):
+        """
+        Pokreće pretragu i čeka rezultat; nakon `timeout` sekundi pretraga se otkazuje.
+        """
+        task = self.submit(agent_kind, state, max_depth, time_ms, collect_stats)
+        try:
+            return task.result(timeout)
+        except TimeoutError:
+            task.cancel()
+            raise Timeout()
+
+    def is_broken(self):
+        """
+        Da li je neki radni proces nasilno prekinut; takav skup procesa odbija sve nove pretrage.
+        """
+        return bool(self.pool._broken)
+
+    def shutdown(self):
+        for slot in range(CANCEL_SLOTS):
+            self.cancel_flags[slot] = 1
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class AsyncSearchQueue:
+    """
+    Ograničava broj pretraga koje čekaju ili se izvršavaju u `SearchExecutor`-u.
+    Kada je red pun, nova pretraga se odmah odbija umesto da čeka.
+    """
+    def __init__(self, max_pending=SEARCH_QUEUE_SIZE):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.lock = threading.Lock()
+
+    async def run(self, agent_kind, state, max_depth=None, time_ms=None, collect_stats=False, timeout=None):
+        """
+        Pokreće pretragu i čeka rezultat; nakon `timeout` sekundi pretraga se otkazuje i baca se `Timeout`.
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise SearchQueueFull()
+            self.pending += 1
+        try:
+            task = get_search_executor().submit(agent_kind, state, max_depth, time_ms, collect_stats)
+            try:
+                return await asyncio.wait_for(task.aresult(), timeout)
+            except asyncio.TimeoutError:
+                raise Timeout()
         finally:
-            if timer:
-                timer.cancel()
+            with self.lock:
+                self.pending -= 1
+
+
+_search_executor = None
+_search_queue = None
+
+
+def get_search_executor():
+    """
+    Vraća deljeni `SearchExecutor`, kreira ga pri prvom pozivu i ponovo kada mu je radni proces prekinut
+    (npr. ubijen zbog memorije), jer pokvaren skup procesa svaku novu pretragu odbija sa `BrokenProcessPool`.
+    """
+    global _search_executor
+    if _search_executor is not None and _search_executor.is_broken():
+        _search_executor.pool.shutdown(wait=False, cancel_futures=True)
+        _search_executor = None
+    if _search_executor is None:
+        _search_executor = SearchExecutor()
+    return _search_executor
+
+
+def get_search_queue():
+    """
+    Vraća deljeni `AsyncSearchQueue`, kreira ga pri prvom pozivu.
+    """
+    global _search_queue
+    if _search_queue is None:
+        _search_queue = AsyncSearchQueue()
+    return _search_queue
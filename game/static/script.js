@@ -6,14 +6,30 @@ document.addEventListener("DOMContentLoaded", () => {
   const turnInfo = document.getElementById("turn-info");
   const restartBtn = document.getElementById("restart-btn");
 
+  const MOVE_CHARS = "0123456789abcdefghijklmnopqrstuvwxyz";
+
   let currentPlayer = "Crveni";
   let gameState = null;
+  let gameId = null;
   let isComputerYellow = false;
   let isComputerRed = false;
 
+  // Kompaktan format: tabla se gradi iz niza poteza (kolone u osnovi 36) i dimenzija igre
+  const boardFromMoves = (moves, rows, cols) => {
+    const board = Array.from({ length: rows }, () => Array(cols).fill(0));
+    const heights = Array(cols).fill(0);
+    [...moves].forEach((move, index) => {
+      const column = MOVE_CHARS.indexOf(move);
+      board[heights[column]][column] = index % 2 === 0 ? 1 : 2;
+      heights[column] += 1;
+    });
+    return board;
+  };
+
   const renderGameBoard = (state) => {
     gameBoard.innerHTML = "";
-    state.board.forEach((row, rowIndex) => {
+    gameBoard.style.gridTemplateColumns = `repeat(${state.cols}, 1fr)`;
+    boardFromMoves(state.moves, state.rows, state.cols).forEach((row, rowIndex) => {
       row.forEach((cell, colIndex) => {
         const cellDiv = document.createElement("div");
         cellDiv.classList.add("tile");
@@ -63,6 +79,7 @@ document.addEventListener("DOMContentLoaded", () => {
         player_yellow: playerYellow,
         max_depth: maxDepth,
         moves: [],
+        format: "compact",
       }),
     })
       .then((response) => {
@@ -74,6 +91,7 @@ document.addEventListener("DOMContentLoaded", () => {
       .then((data) => {
         console.log("Game started:", data);
         gameState = data.state;
+        gameId = data.game_id;
 
         // Sakrij konfiguraciju i prikaži tablu za igru
         gameSetupForm.style.display = "none";
@@ -92,40 +110,47 @@ document.addEventListener("DOMContentLoaded", () => {
   };
 
   const playComputerTurn = () => {
-    fetch("/play_turn/", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({ column: null }), // Računar bira potez
-    })
-      .then((response) => response.json())
-      .then((data) => {
-        if (data.error) {
-          console.error(data.error);
-          return;
-        }
+    // Računar bira potez; napredak pretrage stiže kao događaj po završenoj dubini
+    const params = new URLSearchParams({ game_id: gameId, format: "compact" });
+    const events = new EventSource(`/stream/play_turn/?${params}`);
+
+    events.addEventListener("depth", (event) => {
+      const data = JSON.parse(event.data);
+      updateTurnInfo(
+        `Na potezu: ${currentPlayer} (dubina ${data.depth}, kolona ${data.column + 1})`
+      );
+    });
 
-        gameState = data.state;
-        renderGameBoard(gameState);
+    events.addEventListener("error", (event) => {
+      events.close();
+      if (event.data) {
+        console.error(JSON.parse(event.data).error);
+      } else {
+        console.error("Error playing turn: stream closed");
+      }
+    });
 
-        if (data.message.includes("wins") || data.message.includes("Draw")) {
-          updateTurnInfo(data.message);
-        } else {
-          currentPlayer = currentPlayer === "Crveni" ? "Žuti" : "Crveni";
-          updateTurnInfo(`Na potezu: ${currentPlayer}`);
+    events.addEventListener("move", (event) => {
+      events.close();
+      const data = JSON.parse(event.data);
 
-          if (
-            (currentPlayer === "Crveni" && isComputerRed) ||
-            (currentPlayer === "Žuti" && isComputerYellow)
-          ) {
-            setTimeout(playComputerTurn, 1000); // Pauza pre sledećeg poteza
-          }
+      gameState = data.state;
+      renderGameBoard(gameState);
+
+      if (data.message.includes("wins") || data.message.includes("Draw")) {
+        updateTurnInfo(data.message);
+      } else {
+        currentPlayer = currentPlayer === "Crveni" ? "Žuti" : "Crveni";
+        updateTurnInfo(`Na potezu: ${currentPlayer}`);
+
+        if (
+          (currentPlayer === "Crveni" && isComputerRed) ||
+          (currentPlayer === "Žuti" && isComputerYellow)
+        ) {
+          setTimeout(playComputerTurn, 1000); // Pauza pre sledećeg poteza
         }
-      })
-      .catch((error) => {
-        console.error("Error playing turn:", error);
-      });
+      }
+    });
   };
 
   const playHumanTurn = (column) => {
@@ -134,7 +159,7 @@ document.addEventListener("DOMContentLoaded", () => {
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ column }),
+      body: JSON.stringify({ column, game_id: gameId, format: "compact" }),
     })
       .then((response) => response.json())
       .then((data) => {
@@ -1,8 +1,947 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
 from game.models import GameLog
+from game.models.config import M, N, WIN_CNT, ANALYZE_MAX_DEPTH
+from game.models import Game, BestMove
+from game.models.geometry import DEFAULT_GEOMETRY, Geometry, get_geometry
+from game.models.state import State
+from game.models.move_cache import MoveCache
+from game.models.ponder import Ponderer, get_likely_replies, get_ponderer
+from game.models import game_log
+from game.models.game_log import GameLogWriter, create_game_log
+from game.models.store import (GameRecord, StaleGame, MemoryGameStore, CacheGameStore, DatabaseGameStore, pack_moves,
+                               unpack_moves)
+from game.models import util
+from game.models.util import SearchExecutor, Timeout, get_search_executor, get_search_queue
+from game.tournament import create_tasks, parse_agent_config
+from game.export import get_bitboard_size
+from game import views
+from game.warmup import GEOMETRY_TABLES, build_tables, warm_up
+from game.benchmark import compare, get_position, perft, run_search
+from game.agents.agents import Agent, MinimaxABAgent, CompetitiveAgent, SearchTimeout
+from game.agents import batch
+from game.agents.book import OpeningBook
+from game.agents.parallel import get_parallel_search
+from game.agents.solver import Solver, solve
+from game.agents.stats import SearchStats
+from game.agents.transposition import TranspositionTable
 
 class GameLogTestCase(TestCase):
     def test_create_game_log(self):
         log = GameLog.objects.create(log_data="Test log data")
         self.assertEqual(GameLog.objects.count(), 1)
         self.assertEqual(log.log_data, "Test log data")
+
+
+class StateStatusTestCase(TestCase):
+    def test_win_detection_matches_win_masks(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            checkers = rng.getrandbits(M * N) & rng.getrandbits(M * N)
+            expected = any((checkers & mask) == mask for mask in DEFAULT_GEOMETRY.win_masks)
+            self.assertEqual(DEFAULT_GEOMETRY.is_win(checkers), expected)
+
+    def test_successor_status_matches_fresh_state(self):
+        rng = random.Random(1)
+        for _ in range(50):
+            state = State()
+            while state.get_state_status() is None:
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+                fresh = State()
+                fresh.checkers_red = state.checkers_red
+                fresh.checkers_yellow = state.checkers_yellow
+                self.assertEqual(fresh.get_state_status(), state.get_state_status())
+
+
+class TranspositionTableTestCase(TestCase):
+    def test_replacement_keeps_deeper_entry(self):
+        tt = TranspositionTable(size=1)
+        tt.store("a", 1, 5, TranspositionTable.EXACT, 3)
+        tt.store("b", 2, 2, TranspositionTable.EXACT, 4)
+        tt.store("c", 3, 1, TranspositionTable.EXACT, 2)
+        self.assertEqual(tt.lookup("a")[2], 5)
+        self.assertIsNone(tt.lookup("b"))
+        self.assertEqual(tt.lookup("c")[4], 2)
+        self.assertEqual((tt.hits, tt.misses), (2, 1))
+        self.assertEqual(len(tt), 2)
+
+    def test_search_value_unchanged_by_table(self):
+        state = State()
+        for column in [3, 3, 2, 4]:
+            state = state.generate_successor_state(column)
+        cached = MinimaxABAgent(heuristic="hard")
+        uncached = MinimaxABAgent(tt=TranspositionTable(size=1), heuristic="hard")
+        for _ in range(2):
+            self.assertEqual(cached.minimax(state, 4, True, float('-inf'), float('inf'))[0],
+                             uncached.minimax(state, 4, True, float('-inf'), float('inf'))[0])
+
+    def test_worker_tables_follow_one_game(self):
+        state = get_position("33")
+        agent = util.get_worker_agent("minimax", state)
+        agent.search(state, 3)
+        self.assertGreater(len(agent.tt), 0)
+        # Later positions of the same game keep the table, another game clears it
+        self.assertIs(util.get_worker_agent("minimax", state.generate_successor_state(2)), agent)
+        self.assertGreater(len(agent.tt), 0)
+        util.get_worker_agent("minimax", get_position("44"))
+        self.assertEqual((len(agent.tt), agent.ordering_geometry), (0, None))
+
+
+class IterativeDeepeningTestCase(TestCase):
+    def test_time_budget_returns_legal_column(self):
+        agent = CompetitiveAgent()
+        start = time.perf_counter()
+        column = agent.get_chosen_column(State(), None, 100)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertIn(column, State().get_possible_columns())
+
+    def test_start_game_accepts_time_budget(self):
+        response = self.client.post("/start_game/", {"player_red": "competitive", "time_ms": 50},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/play_turn/", {"column": None}, content_type="application/json")
+        self.assertEqual(response.json()["message"], "Move played.")
+
+
+class SearchExecutorTestCase(TestCase):
+    def setUp(self):
+        self.executor = SearchExecutor(max_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_run_returns_column_elapsed_and_nodes(self):
+        column, elapsed, nodes, stats = self.executor.run("competitive", State(), 3)
+        self.assertIn(column, State().get_possible_columns())
+        self.assertGreaterEqual(elapsed, 0)
+        self.assertGreater(nodes, 0)
+        self.assertIsNone(stats)
+
+    def test_run_collects_stats(self):
+        state = State().generate_successor_state(0).generate_successor_state(6)
+        _, _, nodes, stats = self.executor.run("minimax", state, 4, collect_stats=True)
+        self.assertEqual((stats["source"], stats["nodes"], stats["depth_reached"]), ("search", nodes, 4))
+
+    def test_cancel_stops_running_search(self):
+        task = self.executor.submit("minimax", State(), 20)
+        time.sleep(0.2)
+        task.cancel()
+        with self.assertRaises(Timeout):
+            task.result(timeout=5)
+
+    def test_cancel_leaves_finished_search_slot_alone(self):
+        task = self.executor.submit("minimax", State(), 2)
+        task.result(timeout=30)
+        task.cancel()
+        self.assertEqual(self.executor.cancel_flags[task.slot], 0)
+
+    def test_broken_executor_is_rebuilt(self):
+        executor = util._search_executor
+        util._search_executor = self.executor
+        try:
+            self.executor.run("minimax", State(), 1, timeout=30)
+            for process in list(self.executor.pool._processes.values()):
+                process.kill()
+            with self.assertRaises(BrokenProcessPool):
+                self.executor.run("minimax", State(), 1, timeout=30)
+            rebuilt = get_search_executor()
+            self.assertIsNot(rebuilt, self.executor)
+            self.assertIn(rebuilt.run("minimax", State(), 1, timeout=30)[0], State().get_possible_columns())
+            rebuilt.shutdown()
+        finally:
+            util._search_executor = executor
+
+    def test_search_timeout_returns_504(self):
+        self.client.post("/start_game/", {"player_red": "competitive", "moves": "41565323454124", "max_depth": 20},
+                         content_type="application/json")
+        search_timeout_sec, views.SEARCH_TIMEOUT_SEC = views.SEARCH_TIMEOUT_SEC, 0.1
+        try:
+            response = self.client.post("/play_turn/", {"column": None}, content_type="application/json")
+        finally:
+            views.SEARCH_TIMEOUT_SEC = search_timeout_sec
+        self.assertEqual(response.status_code, 504)
+        self.assertTrue(response.json()["error"])
+
+    def test_spawned_workers_set_django_up(self):
+        # A spawned worker imports the engine from the game.models package in a fresh interpreter
+        executor = SearchExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            self.assertIn(executor.run("minimax", State(), 3, timeout=60)[0], State().get_possible_columns())
+        finally:
+            executor.shutdown()
+
+
+class OpeningBookTestCase(TestCase):
+    def test_write_and_lookup(self):
+        states = [State(), State().generate_successor_state(3),
+                  State().generate_successor_state(3).generate_successor_state(2)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            OpeningBook.write(path, {state.get_key(): i for i, state in enumerate(states)}, 2, 1)
+            book = OpeningBook(path)
+            self.assertEqual([book.lookup(state) for state in states], [0, 1, 2])
+            self.assertIsNone(book.lookup(states[1].generate_successor_state(0)))
+            book.close()
+
+    def test_position_keys_are_unique(self):
+        rng = random.Random(2)
+        keys = {}
+        for _ in range(200):
+            state = State()
+            while state.get_state_status() is None:
+                position = (state.checkers_red, state.checkers_yellow)
+                self.assertEqual(keys.setdefault(state.get_key(), position), position)
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+
+
+class SolverTestCase(TestCase):
+    @staticmethod
+    def play(moves):
+        state = State()
+        for column in moves:
+            state = state.generate_successor_state(column)
+        return state
+
+    def reference_score(self, state):
+        # Plain negamax over State with the solver's scoring
+        moves = bin(state.get_int_state()).count("1")
+        best = None
+        for column in state.get_possible_columns():
+            child = state.generate_successor_state(column)
+            status = child.get_state_status()
+            if status == State.DRAW:
+                score = 0
+            elif status is not None:
+                score = (M * N + 1 - moves) // 2
+            else:
+                score = -self.reference_score(child)
+            best = score if best is None else max(best, score)
+        return best
+
+    @staticmethod
+    def random_endgame(rng, empty_cells):
+        # Random play that avoids ending the game, stopped with empty_cells cells left
+        while True:
+            state = State()
+            for _ in range(M * N - empty_cells):
+                columns = [column for column in state.get_possible_columns()
+                           if state.generate_successor_state(column).get_state_status() is None]
+                if not columns:
+                    break
+                state = state.generate_successor_state(rng.choice(columns))
+            else:
+                return state
+
+    def test_solve_matches_exhaustive_search(self):
+        rng = random.Random(4)
+        for _ in range(5):
+            state = self.random_endgame(rng, 6)
+            self.assertEqual(solve(state), self.reference_score(state))
+
+    def test_immediate_win(self):
+        state = self.play([0, 6, 0, 6, 0, 6])
+        self.assertEqual(Solver().get_chosen_column(state), 0)
+        self.assertEqual(solve(state), (M * N + 1 - 6) // 2)
+
+    def test_competitive_agent_switches_to_solver(self):
+        state = self.random_endgame(random.Random(5), 8)
+        scores = Solver().analyze(state)
+        agent = CompetitiveAgent(use_book=False, solver_empty_cells=8)
+        self.assertEqual(scores[agent.get_chosen_column(state, 1)], max(scores.values()))
+
+    def test_solver_respects_time_budget(self):
+        # A quiet 14-empty position whose full solve takes a few hundred milliseconds
+        state = State.from_bitboards(503602254091, 1694365934292, 0)
+        agent = CompetitiveAgent(use_book=False, heuristic="hard")
+        start = time.perf_counter()
+        column = agent.get_chosen_column(state, None, 10)
+        self.assertLess(time.perf_counter() - start, 0.15)
+        self.assertIn(column, state.get_possible_columns())
+
+    def test_stop_check_interrupts_solver(self):
+        solver = Solver()
+        solver.set_stop_check(lambda: True)
+        with self.assertRaises(SearchTimeout):
+            solver.solve(State.from_bitboards(503602254091, 1694365934292, 0))
+
+
+class IncrementalEvaluationTestCase(TestCase):
+    @staticmethod
+    def free_masks(checkers):
+        return sum(1 for mask in DEFAULT_GEOMETRY.win_masks if (mask & checkers) == 0)
+
+    def test_heuristics_match_full_scan(self):
+        rng = random.Random(6)
+        for _ in range(30):
+            state = State()
+            while state.get_state_status() is None:
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+                for checked in (state, State.from_dict(state.to_dict())):
+                    current = self.free_masks(checked.get_checkers(checked.get_next_on_move()))
+                    opponent = self.free_masks(checked.get_checkers(1 - checked.get_next_on_move()))
+                    self.assertEqual(Agent.easy_heuristic(checked), opponent)
+                    self.assertEqual(Agent.medium_heuristic(checked), opponent - 2 * current)
+                    self.assertEqual(Agent.hard_heuristic(checked), current - opponent)
+
+    def test_hard_heuristic_counts_free_masks_for_any_win_length(self):
+        # Every free mask weighs 1, a connect-5 position does not collapse to 0 or flip its sign
+        for win_count in (3, 4, 5):
+            geometry = get_geometry(6, 7, win_count)
+            state = State(geometry).generate_successor_state(3).generate_successor_state(0)
+            free = [sum(1 for mask in geometry.win_masks if not mask & state.get_checkers(player)) for player in (0, 1)]
+            player = state.get_next_on_move()
+            score = Agent.hard_heuristic(state)
+            self.assertEqual(score, free[player] - free[1 - player])
+            self.assertLess(score, 0)
+
+
+class BatchEvaluationTestCase(TestCase):
+    def test_batch_matches_state_and_heuristics(self):
+        rng = random.Random(7)
+        states = []
+        for _ in range(20):
+            state = State()
+            states.append(state)
+            while state.get_state_status() is None:
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+                states.append(state)
+        reds = [state.checkers_red for state in states]
+        yellows = [state.checkers_yellow for state in states]
+        statuses = batch.get_state_statuses(reds, yellows)
+        self.assertEqual([None if status == batch.NO_STATUS else status for status in statuses],
+                         [state.get_state_status() for state in states])
+        for name, heuristic in (("easy", Agent.easy_heuristic), ("medium", Agent.medium_heuristic),
+                                ("hard", Agent.hard_heuristic)):
+            self.assertEqual(batch.get_heuristic_scores(reds, yellows, heuristic=name).tolist(),
+                             [heuristic(state) for state in states])
+
+
+class AsyncViewsTestCase(TestCase):
+    async def test_async_computer_turn(self):
+        response = await self.async_client.post("/async/start_game/", {"player_red": "competitive", "max_depth": 2},
+                                                content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.post("/async/play_turn/", {"column": None},
+                                                content_type="application/json")
+        self.assertEqual(response.json()["message"], "Move played.")
+
+    async def test_full_search_queue_returns_503(self):
+        await self.async_client.post("/async/start_game/", {"player_red": "competitive"},
+                                     content_type="application/json")
+        queue = get_search_queue()
+        max_pending, queue.max_pending = queue.max_pending, 0
+        try:
+            response = await self.async_client.post("/async/play_turn/", {"column": None},
+                                                    content_type="application/json")
+        finally:
+            queue.max_pending = max_pending
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response.headers)
+
+
+class GameStoreTestCase(TestCase):
+    def test_compact_format_round_trip(self):
+        response = self.client.post("/start_game/", {"moves": "33", "format": "compact"},
+                                    content_type="application/json")
+        game_id = response.json()["game_id"]
+        self.assertEqual(response.json()["state"]["moves"], "33")
+        response = self.client.post("/play_turn/", {"column": 2, "game_id": game_id, "format": "compact"},
+                                    content_type="application/json")
+        compact = response.json()["state"]
+        state = State().generate_successor_state(3).generate_successor_state(3).generate_successor_state(2)
+        self.assertEqual((compact["moves"], compact["red"], compact["yellow"], compact["next_on_move"]),
+                         ("332", str(state.checkers_red), str(state.checkers_yellow), state.get_next_on_move()))
+        self.assertEqual(Game.objects.get(game_id=game_id).moves, "332")
+
+    def test_backends_keep_moves(self):
+        for game_store in (MemoryGameStore(capacity=1), CacheGameStore(), DatabaseGameStore()):
+            record = game_store.create(GameRecord(None, "human", "competitive", 4, None))
+            state = State().generate_successor_state(3)
+            record.play(3, state)
+            game_store.save_move(record, 3)
+            state = state.generate_successor_state(2)
+            record.set_search_time(0.0125)
+            record.play(2, state)
+            game_store.save_move(record, 2)
+            loaded = game_store.load(record.game_id)
+            self.assertEqual((loaded.moves, loaded.checkers_red, loaded.yellow_agent), ("32", state.checkers_red,
+                                                                                         "competitive"))
+            self.assertEqual(loaded.move_ms, [None, 12.5])
+
+    def assert_rejects_concurrent_move(self, game_store):
+        record = game_store.create(GameRecord(None, "human", "human", 4, None))
+        first, second = game_store.load(record.game_id), game_store.load(record.game_id)
+        first.play(3, first.get_state().generate_successor_state(3))
+        game_store.save_move(first, 3)
+        second.play(2, second.get_state().generate_successor_state(2))
+        with self.assertRaises(StaleGame):
+            game_store.save_move(second, 2)
+        loaded = game_store.load(record.game_id)
+        self.assertEqual((loaded.moves, loaded.checkers_red, loaded.move_ms), ("3", first.checkers_red, [None]))
+
+    def test_memory_rejects_concurrent_move(self):
+        self.assert_rejects_concurrent_move(MemoryGameStore())
+
+    def test_cache_rejects_concurrent_move(self):
+        self.assert_rejects_concurrent_move(CacheGameStore())
+
+    def test_database_rejects_concurrent_move(self):
+        self.assert_rejects_concurrent_move(DatabaseGameStore())
+
+
+class BenchmarkTestCase(TestCase):
+    def test_perft(self):
+        self.assertEqual([perft(State(), depth) for depth in range(1, 5)], [7, 49, 343, 2401])
+        # A column filled with alternating checkers drops out of the move count
+        self.assertEqual(perft(get_position("333333"), 2), 36)
+
+    def test_compare_reports_regressions(self):
+        baseline = {"perft": [], "search": run_search(["minimax"], [3])}
+        current = {"perft": [], "search": [dict(entry) for entry in baseline["search"]]}
+        self.assertEqual(compare(baseline, current), [])
+        current["search"][0]["nodes"] += 1
+        self.assertEqual(len(compare(baseline, current)), 1)
+
+
+class SearchStatsTestCase(TestCase):
+    def test_agent_fills_stats(self):
+        agent = MinimaxABAgent(heuristic="hard")
+        stats = SearchStats()
+        agent.set_stats(stats)
+        agent.get_chosen_column(State(), time_ms=10000, max_depth=4)
+        self.assertEqual([depth for depth, _, _ in stats.depths], [1, 2, 3, 4])
+        self.assertEqual(stats.nodes, agent.nodes)
+        self.assertGreater(stats.cutoffs, 0)
+        self.assertGreater(stats.get_branching_factor(), 1)
+
+    def test_play_turn_returns_stats_with_debug(self):
+        self.client.post("/start_game/", {"player_red": "competitive", "moves": "0606", "max_depth": 3},
+                         content_type="application/json")
+        with self.assertLogs("game.search", "INFO") as logs:
+            response = self.client.post("/play_turn/", {"column": None, "debug": True},
+                                        content_type="application/json")
+        self.assertEqual(response.json()["stats"]["depth_reached"], 3)
+        self.assertEqual(json.loads(logs.records[0].getMessage())["stats"], response.json()["stats"])
+
+
+class MoveCacheTestCase(TestCase):
+    def test_memory_lru_and_database_tier(self):
+        cache = MoveCache(size=1, db_size=10)
+        first, second = State().generate_successor_state(3), State().generate_successor_state(2)
+        cache.put("competitive", first, 4, 3)
+        cache.put("competitive", second, 4, 2)
+        self.assertEqual(len(cache.moves), 1)
+        # The first move fell out of memory but is still read from the database
+        self.assertEqual(cache.get("competitive", first, 4), 3)
+        self.assertIsNone(cache.get("competitive", first, 5))
+        self.assertIsNone(cache.get("minimax", first, 4))
+        self.assertEqual(BestMove.objects.count(), 2)
+
+    def test_database_eviction(self):
+        cache = MoveCache(size=0, db_size=2, eviction="fifo", eviction_interval=1)
+        states = [State().generate_successor_state(column) for column in range(3)]
+        for column, state in enumerate(states):
+            cache.put("competitive", state, 4, column)
+        self.assertEqual(BestMove.objects.count(), 2)
+        self.assertEqual(cache.get("competitive", states[2], 4), 2)
+
+    def test_cache_hit_skips_search(self):
+        settings = {"player_red": "competitive", "player_yellow": "competitive", "moves": "1515",
+                    "max_depth": 2}
+        self.client.post("/start_game/", settings, content_type="application/json")
+        first = self.client.post("/play_turn/", {"column": None, "debug": True}, content_type="application/json")
+        self.client.post("/start_game/", settings, content_type="application/json")
+        second = self.client.post("/play_turn/", {"column": None, "debug": True}, content_type="application/json")
+        self.assertEqual(second.json()["stats"]["source"], "cache")
+        self.assertEqual(first.json()["state"], second.json()["state"])
+
+
+class TournamentTestCase(TestCase):
+    def test_round_robin_tasks(self):
+        tasks = create_tasks(["minimax:2", "negascout:2", "competitive:3:medium"], 2, 3, seed=1)
+        self.assertEqual(len(tasks), 3 * 2 * 2)
+        self.assertTrue(all(len(opening) == 3 for _, _, opening in tasks))
+        self.assertEqual(parse_agent_config("minimax:2"), ("minimax", 2, "hard"))
+        with self.assertRaises(ValueError):
+            parse_agent_config("random:2")
+
+    def test_command_writes_game_logs(self):
+        call_command("tournament", "minimax:1", "negascout:2:easy", games=2, workers=2, batch_size=3,
+                     seed=1, stdout=open(os.devnull, "w"))
+        logs = list(GameLog.objects.all())
+        self.assertEqual(len(logs), 4)
+        self.assertTrue(all(log.result in ("red", "yellow", "draw") for log in logs))
+        for log in logs:
+            log_data = json.loads(log.log_data)
+            self.assertEqual(unpack_moves(log.moves, log.cols), [int(char) for char in log_data["moves"]])
+            self.assertEqual(len(log_data["move_ms"]), len(log_data["moves"]) - 2)
+
+
+class ParallelSearchTestCase(TestCase):
+    def tearDown(self):
+        get_parallel_search(2).shutdown()
+
+    def test_same_column_as_sequential_search(self):
+        for moves in ("", "3342", "31542153656"):
+            state = State()
+            for column in moves:
+                state = state.generate_successor_state(int(column))
+            for depth in (6, 7):
+                sequential = CompetitiveAgent(use_book=False, heuristic="hard", workers=0)
+                parallel = CompetitiveAgent(use_book=False, heuristic="hard", workers=2)
+                self.assertEqual(parallel.get_chosen_column(state, depth), sequential.get_chosen_column(state, depth))
+                self.assertGreater(parallel.parallel_nodes, 0)
+
+
+class MoveOrderingTestCase(TestCase):
+    def test_wins_blocks_and_killers_first(self):
+        # Red threatens to win in column 1, yellow in column 6
+        state = State()
+        for column in (1, 6, 1, 6, 1, 6, 0):
+            state = state.generate_successor_state(column)
+        agent = MinimaxABAgent(heuristic="hard")
+        self.assertEqual(state.geometry.get_winning_cells(state.checkers_yellow, state.get_int_state()),
+                         1 << (6 * M + 3))
+        # Yellow wins at once, so no other move is searched
+        self.assertEqual(agent.sorted_columns(state), [6])
+        # Without its own win yellow has to block
+        block = State()
+        for column in (1, 6, 1, 6, 1):
+            block = block.generate_successor_state(column)
+        self.assertEqual(agent.sorted_columns(block), [1])
+        quiet = State().generate_successor_state(3).generate_successor_state(3)
+        agent.record_cutoff(quiet, 0, 3)
+        self.assertEqual(agent.sorted_columns(quiet)[0], 0)
+        self.assertEqual(agent.sorted_columns(quiet, first_column=5)[:2], [5, 0])
+
+    def test_new_search_ages_ordering(self):
+        agent = MinimaxABAgent(heuristic="hard")
+        quiet = State().generate_successor_state(3).generate_successor_state(3)
+        agent.sorted_columns(quiet)
+        agent.record_cutoff(quiet, 0, 4)
+        cell = 0  # Bottom cell of column 0
+        agent.start_search(quiet)
+        self.assertEqual(agent.history[quiet.get_next_on_move()][cell], 8)
+        self.assertEqual(agent.killers[2], [None, None])
+        # Every chosen move starts a new search, so scores of earlier games fade out
+        agent.get_chosen_column(get_position("44"), 1)
+        self.assertEqual(agent.history[quiet.get_next_on_move()][cell], 4)
+
+    def test_dynamic_ordering_cuts_off_on_first_move(self):
+        agent = MinimaxABAgent(heuristic="hard")
+        stats = SearchStats()
+        agent.set_stats(stats)
+        agent.get_chosen_column(State(), 6)
+        self.assertGreater(stats.first_move_cutoffs, stats.cutoffs // 2)
+
+
+class GeometryTestCase(TestCase):
+    def test_tables_are_shared_and_built_lazily(self):
+        geometry = get_geometry(8, 9, 5)
+        self.assertIs(geometry, get_geometry(8, 9, 5))
+        self.assertNotIn("win_masks", vars(Geometry(8, 9, 5)))
+        # 8x9 connect-5: 5 runs per column, 5 per row, 4 * 5 per diagonal direction
+        self.assertEqual(len(geometry.win_masks), 9 * 4 + 8 * 5 + 2 * 4 * 5)
+        self.assertIs(State(geometry).generate_successor_state(4).geometry, geometry)
+        with self.assertRaises(ValueError):
+            get_geometry(4, 4, 5)
+
+    def test_connect_five_game(self):
+        state = State(get_geometry(8, 9, 5))
+        for column in (0, 8, 0, 8, 0, 8, 0, 8):
+            state = state.generate_successor_state(column)
+        self.assertIsNone(state.get_state_status())
+        self.assertEqual(state.generate_successor_state(0).get_state_status(), State.RED)
+
+    def test_start_game_with_geometry(self):
+        response = self.client.post("/start_game/", {"player_yellow": "competitive", "rows": 8, "cols": 9,
+                                                     "win_count": 5, "max_depth": 3, "format": "compact"},
+                                    content_type="application/json")
+        self.assertEqual(response.json()["state"]["cols"], 9)
+        response = self.client.post("/play_turn/", {"column": 8}, content_type="application/json")
+        response = self.client.post("/play_turn/", {"column": None}, content_type="application/json")
+        board = response.json()["state"]["board"]
+        self.assertEqual((len(board), len(board[0])), (8, 9))
+        self.assertEqual(sum(cell != 0 for row in board for cell in row), 2)
+        response = self.client.post("/start_game/", {"rows": 4, "cols": 4, "win_count": 5},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class MakeUnmakeMoveTestCase(TestCase):
+    def test_unmake_restores_state(self):
+        rng = random.Random(18)
+        for _ in range(50):
+            state = State()
+            for _ in range(rng.randrange(30)):
+                if state.get_state_status() is not None:
+                    break
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+            if state.get_state_status() is not None:
+                continue
+            before = (state.checkers_red, state.checkers_yellow, state.get_next_on_move(),
+                      state.get_free_masks(State.RED), state.get_free_masks(State.YEL), list(state.get_heights()))
+            for column in state.get_possible_columns():
+                child = state.generate_successor_state(column)
+                state.make_move(column)
+                self.assertEqual((state.checkers_red, state.checkers_yellow, state.get_state_status(),
+                                  state.get_free_masks(State.RED), state.get_free_masks(State.YEL)),
+                                 (child.checkers_red, child.checkers_yellow, child.get_state_status(),
+                                  child.get_free_masks(State.RED), child.get_free_masks(State.YEL)))
+                state.unmake_move()
+                self.assertEqual((state.checkers_red, state.checkers_yellow, state.get_next_on_move(),
+                                  state.get_free_masks(State.RED), state.get_free_masks(State.YEL),
+                                  state.get_heights()), before)
+                self.assertIsNone(state.get_state_status())
+
+    def test_possible_columns_and_heights(self):
+        state = State()
+        for column in (2, 2, 2, 3, 2, 2, 2):
+            state = state.generate_successor_state(column)
+        self.assertEqual(tuple(state.get_possible_columns()), (0, 1, 3, 4, 5, 6))
+        self.assertEqual(state.get_column_height(2), M)
+        self.assertEqual(State.from_bitboards(state.checkers_red, state.checkers_yellow,
+                                              state.get_next_on_move()).get_heights(), state.get_heights())
+        self.assertFalse(hasattr(state, "__dict__"))
+
+
+class AnalyzeTestCase(TestCase):
+    def test_best_score_matches_search(self):
+        rng = random.Random(5)
+        for _ in range(10):
+            state = State()
+            for _ in range(rng.randrange(12)):
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+            if state.get_state_status() is not None:
+                continue
+            for depth in (1, 2, 3):
+                value, _ = MinimaxABAgent(heuristic="hard").search(state, depth)
+                scores, _ = MinimaxABAgent(heuristic="hard").analyze(state, depth)
+                self.assertEqual(max(scores[col] for col in Agent.get_tactical_columns(state)), value)
+                self.assertEqual(set(scores), set(state.get_possible_columns()))
+
+    def test_analyze_batch(self):
+        state = State()
+        for column in (3, 3, 2, 2, 1, 1):
+            state = state.generate_successor_state(column)
+        positions = ["332211", {"red": state.checkers_red, "yellow": state.checkers_yellow}, "3030303", [3]]
+        response = self.client.post("/analyze/", {"positions": positions, "agent": "minimax", "max_depth": 1},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        # Red completes the row in column 0 or 4
+        self.assertIn(results[0]["best_column"], (0, 4))
+        self.assertEqual(results[0]["scores"], results[1]["scores"])
+        self.assertEqual(results[2]["message"], "Red wins!")
+        self.assertEqual(len(results[3]["scores"]), N)
+
+    def test_invalid_positions(self):
+        for positions in ([], [{"red": 1 << 1, "yellow": 0}], [{"red": 1, "yellow": 1 << 2}]):
+            response = self.client.post("/analyze/", {"positions": positions}, content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+
+    def test_depth_and_time_are_limited(self):
+        response = self.client.post("/analyze/", {"positions": ["3342"], "agent": "minimax", "max_depth": 99},
+                                    content_type="application/json")
+        self.assertEqual(response.json()["results"][0]["depth"], ANALYZE_MAX_DEPTH)
+        views.ANALYZE_TIMEOUT_SEC, previous = 0, views.ANALYZE_TIMEOUT_SEC
+        try:
+            response = self.client.post("/analyze/", {"positions": ["3342"], "agent": "minimax", "max_depth": 8},
+                                        content_type="application/json")
+        finally:
+            views.ANALYZE_TIMEOUT_SEC = previous
+        self.assertEqual(response.status_code, 503)
+
+
+class StreamTurnTestCase(TestCase):
+    def start_game(self, max_depth, moves="33221"):
+        response = self.client.post("/start_game/", {"player_yellow": "competitive", "max_depth": max_depth,
+                                                     "moves": moves}, content_type="application/json")
+        return response.json()["game_id"]
+
+    def test_streams_depths_then_move(self):
+        game_id = self.start_game(3)
+        response = self.client.get("/stream/play_turn/", {"game_id": game_id, "format": "compact"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = [event.split("\n") for event in b"".join(response.streaming_content).decode().split("\n\n")
+                  if event]
+        names = [lines[0] for lines in events]
+        self.assertEqual(names, ["event: depth"] * 3 + ["event: move"])
+        depths = [json.loads(lines[1][len("data: "):]) for lines in events]
+        self.assertEqual([event["depth"] for event in depths[:3]], [1, 2, 3])
+        # The committed move is the best move of the deepest depth
+        self.assertEqual(depths[3]["column"], depths[2]["column"])
+        self.assertEqual(depths[3]["state"]["moves"], "33221" + str(depths[3]["column"]))
+
+    def test_closed_stream_does_not_play(self):
+        game_id = self.start_game(5)
+        response = self.client.get("/stream/play_turn/", {"game_id": game_id})
+        self.assertTrue(next(iter(response.streaming_content)).startswith(b"event: depth"))
+        response.close()
+        state = self.client.post("/play_turn/", {"column": 0, "game_id": game_id, "format": "compact"},
+                                 content_type="application/json").json()["state"]
+        self.assertEqual(state["moves"], "332210")
+
+    def test_cancelled_ponder_search_falls_back(self):
+        # Another position than in the other tests, so the move cache does not answer
+        game_id = self.start_game(3, "33155")
+        state = get_position("33155")
+        # The pondering search of the played reply was cancelled before the stream took it
+        task = get_search_executor().submit("competitive", state, 20)
+        task.cancel()
+        ponderer = get_ponderer()
+        with ponderer.lock:
+            ponderer.tasks[game_id] = {(state.checkers_red, state.checkers_yellow): task}
+            ponderer.pending += 1
+        response = self.client.get("/stream/play_turn/", {"game_id": game_id, "format": "compact"})
+        events = b"".join(response.streaming_content).decode()
+        self.assertNotIn("event: error", events)
+        self.assertEqual(events.count("event: depth"), 3)
+        self.assertIn("event: move", events)
+
+
+class GameLogPipelineTestCase(TestCase):
+    def test_pack_moves(self):
+        rng = random.Random(2)
+        for cols in (1, 2, 7, 8, 9, 16):
+            for length in (0, 1, 5, 42, 128):
+                columns = [rng.randrange(cols) for _ in range(length)]
+                packed = pack_moves(columns, cols)
+                self.assertEqual(unpack_moves(packed, cols), columns)
+        self.assertEqual(len(pack_moves([3] * 42, N)), 1 + 16)
+
+    def test_writer_flushes_in_batches(self):
+        writer = GameLogWriter(queue_size=5, batch_size=2)
+        for i in range(6):
+            writer.log(create_game_log([3, 3, 2, 2, 1, 1, i % N], "red", "human", "competitive"))
+        self.assertEqual(GameLog.objects.count(), 0)
+        writer.flush()
+        self.assertEqual(writer.get_stats(), {"pending": 0, "written": 5, "dropped": 1})
+        self.assertEqual(GameLog.objects.filter(result="red", opening__startswith="332211").count(), 5)
+
+    def test_finished_game_is_logged(self):
+        writer = GameLogWriter()
+        game_log._game_log_writer, previous = writer, game_log._game_log_writer
+        try:
+            response = self.client.post("/start_game/", {"moves": "010101"}, content_type="application/json")
+            game_id = response.json()["game_id"]
+            self.client.post("/play_turn/", {"column": 0, "game_id": game_id}, content_type="application/json")
+            writer.flush()
+        finally:
+            game_log._game_log_writer = previous
+        log = GameLog.objects.get()
+        self.assertEqual((log.result, log.opening, log.red_agent), ("red", "0101010", "human"))
+        self.assertEqual(json.loads(log.log_data)["game_id"], game_id)
+        self.assertEqual(json.loads(log.log_data)["move_ms"], [None] * 7)
+
+    def test_computer_move_times_are_logged(self):
+        writer = GameLogWriter()
+        game_log._game_log_writer, previous = writer, game_log._game_log_writer
+        try:
+            # Red threatens column 6 and row 0 at once, so after the computer's move red wins with the other one
+            response = self.client.post("/start_game/", {"player_yellow": "competitive", "max_depth": 2,
+                                                         "moves": "606061314", "format": "compact"},
+                                        content_type="application/json")
+            game_id = response.json()["game_id"]
+            response = self.client.post("/play_turn/", {"game_id": game_id, "format": "compact"},
+                                        content_type="application/json")
+            column = 5 if response.json()["state"]["moves"][-1] == "6" else 6
+            self.client.post("/play_turn/", {"column": column, "game_id": game_id}, content_type="application/json")
+            writer.flush()
+        finally:
+            game_log._game_log_writer = previous
+        move_ms = json.loads(GameLog.objects.get().log_data)["move_ms"]
+        self.assertEqual(len(move_ms), 11)
+        self.assertIsNone(move_ms[-1])
+        self.assertGreaterEqual(move_ms[-2], 0)
+
+
+# The writer thread has its own database connection, so its inserts must not wait on the test transaction
+class GameLogWriterThreadTestCase(TransactionTestCase):
+    def test_stop_writes_the_batch_in_hand(self):
+        writer = GameLogWriter(batch_size=10, flush_sec=60)
+        writer.start()
+        writer.log(create_game_log([3, 3, 2, 2, 1, 1, 0], "red", "human", "competitive"))
+        # The thread takes the game off the queue and waits for the rest of the batch
+        deadline = time.monotonic() + 5
+        while writer.get_stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        writer.stop()
+        self.assertEqual(writer.get_stats(), {"pending": 0, "written": 1, "dropped": 0})
+
+
+class ExportGamesTestCase(TestCase):
+    def setUp(self):
+        GameLog.objects.bulk_create([
+            create_game_log([3, 3, 2, 2, 1, 1, 0], "red", "competitive:6:hard", "human"),
+            create_game_log([0, 1, 0, 1, 0, 1, 0], "red", "minimax:4:hard", "negascout:4:hard"),
+            GameLog(log_data="Legacy log"),
+        ])
+
+    def export(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "positions")
+            call_command("export_games", path, *args, stdout=open(os.devnull, "w"), **options)
+            with open(path, "rb") as file:
+                return file.read()
+
+    def test_jsonl_positions_replay_the_games(self):
+        records = [json.loads(line) for line in self.export().decode().splitlines()]
+        self.assertEqual(len(records), 14)
+        state = State()
+        for record in records[:7]:
+            self.assertEqual((record["red"], record["yellow"], record["side"], record["result"]),
+                             (state.checkers_red, state.checkers_yellow, state.get_next_on_move(), State.RED))
+            state = state.generate_successor_state([3, 3, 2, 2, 1, 1, 0][record["ply"]])
+
+    def test_binary_records_and_filters(self):
+        size = 2 * get_bitboard_size(DEFAULT_GEOMETRY) + 2
+        data = self.export(format="binary", agent="competitive")
+        self.assertEqual(len(data), 7 * size)
+        last = data[6 * size:]
+        state = State()
+        for column in (3, 3, 2, 2, 1, 1):
+            state = state.generate_successor_state(column)
+        self.assertEqual(int.from_bytes(last[:8], "little"), state.checkers_red)
+        self.assertEqual(int.from_bytes(last[8:16], "little"), state.checkers_yellow)
+        self.assertEqual(tuple(last[16:]), (State.RED, State.RED))
+        self.assertEqual(self.export(since="2999-01-01"), b"")
+        self.assertEqual(self.export(opening="010"), self.export(agent="negascout"))
+        self.assertEqual(len(self.export(opening="010", format="binary")), 7 * size)
+
+
+class PonderTestCase(TestCase):
+    def setUp(self):
+        self.executor = SearchExecutor(max_workers=3)
+        self.state = State()
+        for column in (3, 3, 2):
+            self.state = self.state.generate_successor_state(column)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def wait(self, ponderer):
+        deadline = time.monotonic() + 10
+        while ponderer.get_stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_likely_replies_block_first(self):
+        state = State()
+        for column in (3, 0, 2, 0):
+            state = state.generate_successor_state(column)
+        state = state.generate_successor_state(4)
+        # Yellow must block one of the open ends of the row first
+        self.assertIn(get_likely_replies(state)[0], (1, 5))
+
+    def test_prepared_reply_matches_search(self):
+        ponderer = Ponderer(replies=2, max_tasks=3, executor=self.executor)
+        ponderer.start("game", "minimax", self.state, 4)
+        self.wait(ponderer)
+        self.assertEqual(ponderer.get_stats()["positions"], 2)
+        reply = get_likely_replies(self.state)[0]
+        child = self.state.generate_successor_state(reply)
+        column, task = ponderer.take("game", child)
+        self.assertIsNone(task)
+        self.assertEqual(column, self.executor.run("minimax", child, 4)[0])
+        self.assertEqual(ponderer.get_stats()["positions"], 0)
+
+    def test_other_reply_cancels_pondering(self):
+        ponderer = Ponderer(replies=3, max_tasks=3, executor=self.executor)
+        ponderer.start("game", "minimax", self.state, 20)
+        child = self.state.generate_successor_state(get_likely_replies(self.state)[-1])
+        self.assertEqual(ponderer.take("game", child), (None, None))
+        self.assertEqual(ponderer.get_stats()["pending"], 0)
+        # The cancelled searches stop, so the worker answers the next search
+        self.assertIsNotNone(self.executor.run("minimax", child, 2, timeout=5)[0])
+
+    def test_size_and_ttl(self):
+        ponderer = Ponderer(replies=2, size=3, max_tasks=3, executor=self.executor)
+        for game_id in ("a", "b"):
+            ponderer.start(game_id, "minimax", self.state, 1)
+            self.wait(ponderer)
+        self.assertEqual(ponderer.get_stats()["games"], 1)
+        ponderer.ttl_sec = 0
+        ponderer.start("c", "minimax", self.state, 1)
+        self.wait(ponderer)
+        child = self.state.generate_successor_state(get_likely_replies(self.state)[0])
+        self.assertEqual(ponderer.take("c", child), (None, None))
+
+    def test_leaves_a_worker_for_computer_moves(self):
+        ponderer = Ponderer(replies=3, max_tasks=10, executor=self.executor)
+        ponderer.start("game", "minimax", self.state, 20)
+        self.assertEqual(ponderer.get_stats()["pending"], 2)
+        ponderer.drop("game")
+        single = SearchExecutor(max_workers=1)
+        try:
+            ponderer = Ponderer(replies=3, executor=single)
+            ponderer.start("game", "minimax", self.state, 20)
+            self.assertEqual(ponderer.get_stats()["pending"], 0)
+        finally:
+            single.shutdown()
+
+
+class TacticalColumnsTestCase(TestCase):
+    def test_matches_one_ply_lookahead(self):
+        rng = random.Random(4)
+        for _ in range(300):
+            state = State()
+            for _ in range(rng.randrange(30)):
+                if state.get_state_status() is not None:
+                    break
+                state = state.generate_successor_state(rng.choice(state.get_possible_columns()))
+            if state.get_state_status() is not None:
+                continue
+            player = state.get_next_on_move()
+            children = {column: state.generate_successor_state(column) for column in state.get_possible_columns()}
+            wins = [column for column, child in children.items() if child.get_state_status() == player]
+
+            def opponent_wins(child):
+                return any(child.generate_successor_state(column).get_state_status() == 1 - player
+                           for column in child.get_possible_columns()) if child.get_state_status() is None else False
+
+            columns = Agent.get_tactical_columns(state)
+            if wins:
+                self.assertEqual(len(columns), 1)
+                self.assertIn(columns[0], wins)
+                continue
+            safe = [column for column, child in children.items() if not opponent_wins(child)]
+            self.assertEqual(list(columns), safe or list(columns))
+            self.assertTrue(set(columns) <= set(children))
+
+    def test_competitive_answers_without_search(self):
+        state = State()
+        for column in (1, 0, 2, 6, 3):
+            state = state.generate_successor_state(column)
+        agent = CompetitiveAgent(use_book=False)
+        stats = SearchStats()
+        agent.set_stats(stats)
+        # Yellow has a single move that does not lose at once
+        self.assertEqual(agent.get_chosen_column(state, 8), 4)
+        self.assertEqual((stats.source, agent.nodes), ("tactics", 0))
+
+
+class WarmupTestCase(TestCase):
+    def test_builds_tables_without_workers(self):
+        geometry = Geometry(5, 6, 4)
+        build_tables(geometry)
+        for name in GEOMETRY_TABLES:
+            self.assertIn(name, geometry.__dict__)
+        self.assertEqual(len(geometry.free_columns), 1 << geometry.cols)
+        # The warm-up runs before the fork, so it must not start the search processes
+        executor = util._search_executor
+        self.assertGreater(warm_up(depth=2), 0)
+        self.assertIs(util._search_executor, executor)
+
+    def test_keeps_agent_ids(self):
+        # Agents created after the warm-up still get the default heuristics of their ids
+        ident = Agent.ident
+        warm_up(depth=1)
+        self.assertEqual(Agent.ident, ident)
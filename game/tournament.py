@@ -0,0 +1,137 @@
+import itertools
+import random
+import time
+
+from game.agents.agents import Agent, MinimaxABAgent, NegascoutAgent, CompetitiveAgent
+from game.models.game_log import RESULTS, create_game_log
+from game.models.state import State
+from game.models.store import decode_moves, encode_moves
+
+AGENT_CLASSES = {
+    "minimax": MinimaxABAgent,
+    "negascout": NegascoutAgent,
+    "competitive": CompetitiveAgent,
+}
+
+
+def parse_agent_config(config):
+    """
+    Parses "kind:depth:heuristic", e.g. "competitive:6:hard"; depth and heuristic are optional.
+    """
+    parts = config.split(":")
+    kind = parts[0]
+    if kind not in AGENT_CLASSES or len(parts) > 3:
+        raise ValueError(f'Invalid agent config {config}!')
+    depth = int(parts[1]) if len(parts) > 1 and parts[1] else 4
+    heuristic = parts[2] if len(parts) > 2 else "hard"
+    if heuristic not in Agent.HEURISTICS:
+        raise ValueError(f'Unknown heuristic {heuristic}!')
+    return kind, depth, heuristic
+
+
+def create_agent(config):
+    kind, _, heuristic = parse_agent_config(config)
+    if kind == "competitive":
+        # The opening book would hide the depth and heuristic being compared
+        return CompetitiveAgent(use_book=False, heuristic=heuristic)
+    return AGENT_CLASSES[kind](heuristic=heuristic)
+
+
+def random_opening(rng, plies):
+    """
+    Random moves from the empty board that do not end the game.
+    """
+    state = State()
+    columns = []
+    while len(columns) < plies:
+        candidates = [column for column in state.get_possible_columns()
+                      if state.generate_successor_state(column).get_state_status() is None]
+        if not candidates:
+            break
+        column = rng.choice(candidates)
+        state = state.generate_successor_state(column)
+        columns.append(column)
+    return columns
+
+
+def create_tasks(configs, games_per_pair, opening_plies, seed=None):
+    """
+    Round robin: every ordered pair of configurations plays games_per_pair games, so each pair
+    meets with both colours. Both colour orders of a pair share the same openings.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    for red, yellow in itertools.combinations(configs, 2):
+        for _ in range(games_per_pair):
+            opening = random_opening(rng, opening_plies)
+            tasks.append((red, yellow, opening))
+            tasks.append((yellow, red, opening))
+    return tasks
+
+
+def play_game(task):
+    """
+    Plays one game to the end; runs inside a pool worker.
+    """
+    red, yellow, opening = task
+    agents = {State.RED: create_agent(red), State.YEL: create_agent(yellow)}
+    depths = {State.RED: parse_agent_config(red)[1], State.YEL: parse_agent_config(yellow)[1]}
+    seconds = {State.RED: 0.0, State.YEL: 0.0}
+    move_ms = []  # Thinking time of every move after the opening
+
+    state = State()
+    columns = list(opening)
+    for column in opening:
+        state = state.generate_successor_state(column)
+    while state.get_state_status() is None:
+        player = state.get_next_on_move()
+        start_time = time.perf_counter()
+        column = agents[player].get_chosen_column(state, depths[player])
+        elapsed_time = time.perf_counter() - start_time
+        seconds[player] += elapsed_time
+        move_ms.append(round(elapsed_time * 1000, 3))
+        state = state.generate_successor_state(column)
+        columns.append(column)
+
+    return {
+        "red": red,
+        "yellow": yellow,
+        "opening": encode_moves(opening),
+        "moves": encode_moves(columns),
+        "result": RESULTS[state.get_state_status()],
+        "red_seconds": round(seconds[State.RED], 4),
+        "yellow_seconds": round(seconds[State.YEL], 4),
+        "red_nodes": agents[State.RED].nodes,
+        "yellow_nodes": agents[State.YEL].nodes,
+        "move_ms": move_ms,
+    }
+
+
+def get_standings(results):
+    """
+    Returns {config: {"wins", "draws", "losses", "points", "seconds"}} with 1 point per win, 0.5 per draw.
+    """
+    standings = {}
+    for result in results:
+        for color, opponent in (("red", "yellow"), ("yellow", "red")):
+            entry = standings.setdefault(result[color], {"wins": 0, "draws": 0, "losses": 0,
+                                                         "points": 0.0, "seconds": 0.0})
+            entry["seconds"] += result[f"{color}_seconds"]
+            if result["result"] == "draw":
+                entry["draws"] += 1
+                entry["points"] += 0.5
+            elif result["result"] == color:
+                entry["wins"] += 1
+                entry["points"] += 1
+            else:
+                entry["losses"] += 1
+    return standings
+
+
+def to_game_log(result):
+    """
+    Unsaved GameLog of a played game: indexed result and opening columns, packed moves and the
+    whole result as log data.
+    """
+    return create_game_log(decode_moves(result["moves"]), result["result"], result["red"], result["yellow"],
+                           log_data={"event": "tournament", **result})
@@ -5,5 +5,9 @@ urlpatterns = [
     path('', views.frontend, name='frontend'),
     path("start_game/", views.start_game, name="start_game"),
     path("play_turn/", views.play_turn, name="play_turn"),
+    path("async/start_game/", views.start_game_async, name="start_game_async"),
+    path("async/play_turn/", views.play_turn_async, name="play_turn_async"),
+    path("stream/play_turn/", views.play_turn_stream, name="play_turn_stream"),
+    path("analyze/", views.analyze, name="analyze"),
 ]
 
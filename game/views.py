@@ -1,11 +1,27 @@
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from game.models.state import State
 from game.agents.agents import MinimaxABAgent, NegascoutAgent, CompetitiveAgent
 import json
-from queue import Queue
-from .models.util import TimedFunction
+import time
+from concurrent.futures.process import BrokenProcessPool
+from .agents.stats import SearchStats
+from .models.config import (M, N, WIN_CNT, SEARCH_RETRY_AFTER_SEC, SEARCH_TIMEOUT_SEC, SEARCH_TIMEOUT_MARGIN_SEC,
+                            SEARCH_STATS, ANALYZE_MAX_POSITIONS, ANALYZE_MAX_DEPTH, ANALYZE_MAX_TIME_MS,
+                            ANALYZE_TIMEOUT_SEC,
+                            STREAM_KEEPALIVE_SEC, PONDER_REPLIES)
+from .models.game_log import RESULTS, create_game_log, get_game_log_writer
+from .models.geometry import get_geometry
+from .models.move_cache import get_move_cache
+from .models.store import GameRecord, decode_moves, get_game_store
+from .models.ponder import get_ponderer
+from .models.util import get_search_executor, get_search_queue, SearchQueueFull, Timeout, AGENT_KINDS
+
+search_logger = logging.getLogger("game.search")
 
 def frontend(request):
     """
@@ -13,6 +29,318 @@ def frontend(request):
     """
     return render(request, "index.html")
 
+def read_game_settings(data):
+    """
+    Čita postavke nove igre iz zahteva.
+    Vraća početno stanje i zapis igre ili baca `ValueError` za nevalidne igrače ili dimenzije table.
+    """
+    # Preuzmi postavke iz zahteva
+    player_red = data.get("player_red", "human")
+    player_yellow = data.get("player_yellow", "human")
+    # Vremenski budžet (ms) je alternativa fiksnoj dubini pretrage
+    time_ms = data.get("time_ms")
+    time_ms = int(time_ms) if time_ms is not None else None
+    max_depth = data.get("max_depth", 4 if time_ms is None else None)
+    max_depth = int(max_depth) if max_depth is not None else None
+    # Dimenzije table i dužina niza za pobedu biraju se po igri
+    geometry = get_geometry(int(data.get("rows", M)), int(data.get("cols", N)), int(data.get("win_count", WIN_CNT)))
+    moves = data.get("moves", [])
+    # Potezi mogu stići i kao kompaktan niz znakova, npr. "3342"
+    if isinstance(moves, str):
+        moves = decode_moves(moves)
+
+    # Kreiraj agente
+    agents = {
+        "minimax": MinimaxABAgent(),
+        "negascout": NegascoutAgent(),
+        "competitive": CompetitiveAgent(),
+        "human": None
+    }
+    red_agent = agents.get(player_red, None)
+    yellow_agent = agents.get(player_yellow, None)
+
+    # Proveri da li su agenti validni
+    if red_agent is None and player_red != "human":
+        raise ValueError("Invalid agent for Red player.")
+    if yellow_agent is None and player_yellow != "human":
+        raise ValueError("Invalid agent for Yellow player.")
+
+    # Kreiraj početno stanje igre
+    state = State(geometry)
+    record = GameRecord(None, player_red, player_yellow, max_depth, time_ms, geometry=geometry)
+    for move in moves:
+        state = state.generate_successor_state(move)
+        record.play(move, state)
+
+    return state, record
+
+def get_turn_agent(state, record):
+    """
+    Vraća vrstu agenta koji bira potez u datom stanju ili None ako je na potezu čovek.
+    """
+    agent_kind = record.red_agent if state.get_next_on_move() == State.RED else record.yellow_agent
+    return agent_kind if agent_kind == "competitive" else None
+
+def state_payload(state, record, data):
+    """
+    Stanje za odgovor: 2D tabla ili, ako klijent to traži, kompaktan format.
+    """
+    if data.get("format") == "compact":
+        return record.to_compact()
+    return state.to_dict()
+
+def collect_stats(data):
+    """
+    Statistika pretrage se prikuplja za zahteve sa "debug" ili uvek, ako je uključen `SEARCH_STATS`.
+    """
+    return SEARCH_STATS or bool(data.get("debug"))
+
+def log_search(record, agent_kind, elapsed_time, nodes, stats):
+    """
+    Upisuje jednu strukturisanu (JSON) log liniju o pretrazi računara i pamti njeno vreme uz sledeći potez igre.
+    """
+    record.set_search_time(elapsed_time)
+    search_logger.info(json.dumps({
+        "event": "search",
+        "game_id": record.game_id,
+        "agent": agent_kind,
+        "ply": len(record.moves),
+        "max_depth": record.max_depth,
+        "time_ms": record.time_ms,
+        "elapsed_ms": round(elapsed_time * 1000, 3),
+        "nodes": nodes,
+        "nps": round(nodes / elapsed_time) if elapsed_time else None,
+        "stats": stats,
+    }))
+
+def cached_column(agent_kind, state, record, data):
+    """
+    Vraća (kolona, statistika) iz keša najboljih poteza ili (None, None).
+    Keširaju se samo pretrage fiksne dubine; rezultat pretrage sa vremenskim budžetom zavisi od opterećenja.
+    """
+    if record.time_ms is not None:
+        return None, None
+    start_time = time.perf_counter()
+    column = get_move_cache().get(agent_kind, state, record.max_depth)
+    if column is None:
+        return None, None
+    stats = None
+    if collect_stats(data):
+        stats = SearchStats()
+        stats.source = "cache"
+        stats = stats.to_dict()
+    log_search(record, agent_kind, time.perf_counter() - start_time, 0, stats)
+    return column, stats
+
+def remember_column(agent_kind, state, record, column):
+    """
+    Pamti potez pretrage fiksne dubine u kešu najboljih poteza.
+    """
+    if record.time_ms is None:
+        get_move_cache().put(agent_kind, state, record.max_depth, column)
+
+def pondered_column(agent_kind, state, record, data):
+    """
+    Vraća (kolona, statistika, zadatak): potez pripremljen dok je čovek razmišljao ili, ako pretraga
+    tog razmišljanja još traje, njen zadatak (kolona je tada None).
+    """
+    column, task = get_ponderer().take(record.game_id, state)
+    stats = None
+    if column is not None:
+        if collect_stats(data):
+            stats = SearchStats()
+            stats.source = "ponder"
+            stats = stats.to_dict()
+        log_search(record, agent_kind, 0, 0, stats)
+        remember_column(agent_kind, state, record, column)
+    return column, stats, task
+
+def ponder(state, record, computer_moved):
+    """
+    Posle poteza računara pokreće pretrage verovatnih odgovora čoveka; posle poteza čoveka
+    zadržava samo pretragu odigranog odgovora.
+    """
+    ponderer = get_ponderer()
+    if state.get_state_status() is not None:
+        ponderer.drop(record.game_id)
+    elif not computer_moved:
+        ponderer.select(record.game_id, state)
+    elif PONDER_REPLIES and get_turn_agent(state, record) is None:
+        agent_kind = record.red_agent if state.get_next_on_move() == State.YEL else record.yellow_agent
+        ponderer.start(record.game_id, agent_kind, state, record.max_depth, record.time_ms)
+
+def log_finished_game(state, record):
+    """
+    Završenu igru predaje baferisanom upisu u GameLog; zahtev ne čeka na bazu.
+    """
+    status = state.get_state_status()
+    if status is not None:
+        get_game_log_writer().log(create_game_log(
+            decode_moves(record.moves), RESULTS[status], record.red_agent, record.yellow_agent, record.geometry,
+            {"event": "game", "game_id": record.game_id, "max_depth": record.max_depth, "time_ms": record.time_ms,
+             "move_ms": record.move_ms}))
+
+def turn_payload(state, record, data, stats=None):
+    """
+    Sadržaj odgovora nakon odigranog poteza, uz proveru pobednika.
+    """
+    payload = {"state": state_payload(state, record, data), "game_id": record.game_id}
+    # Statistika pretrage se vraća samo klijentima koji je traže
+    if stats is not None and data.get("debug"):
+        payload["stats"] = stats
+    status = state.get_state_status()
+    if status == State.RED:
+        return {"message": "Red wins!", **payload}
+    elif status == State.YEL:
+        return {"message": "Yellow wins!", **payload}
+    elif status == State.DRAW:
+        return {"message": "Draw!", **payload}
+
+    return {"message": "Move played.", **payload}
+
+def turn_response(state, record, data, stats=None):
+    """
+    Pravi odgovor nakon odigranog poteza, uz proveru pobednika.
+    """
+    return JsonResponse(turn_payload(state, record, data, stats), status=200)
+
+def search_timeout(record):
+    """
+    Najduže čekanje na potez računara: vremenski budžet uz rezervu, a bez budžeta `SEARCH_TIMEOUT_SEC`.
+    """
+    if record.time_ms is None:
+        return SEARCH_TIMEOUT_SEC
+    return record.time_ms / 1000 + SEARCH_TIMEOUT_MARGIN_SEC
+
+def search_failed_response(error):
+    """
+    Odgovor kada potez računara nije izračunat: 503 kada je radni proces pao, 504 kada je isteklo vreme.
+    """
+    if isinstance(error, BrokenProcessPool):
+        response = JsonResponse({"error": "Search workers are unavailable, try again later."}, status=503)
+        response["Retry-After"] = str(SEARCH_RETRY_AFTER_SEC)
+        return response
+    return JsonResponse({"error": "Search did not finish in time."}, status=504)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def wait_depth(task, deadline):
+    """
+    Čeka rezultat pretrage jedne dubine i u međuvremenu vraća komentare koji održavaju vezu.
+    Vraća rezultat pretrage ili None ako rok istekne pre njenog kraja.
+    """
+    while True:
+        timeout = STREAM_KEEPALIVE_SEC
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time.perf_counter(), 0))
+        try:
+            return task.result(timeout)
+        except TimeoutError:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            # Zatvorenu vezu server primećuje tek pri upisu
+            yield ": keepalive\n\n"
+
+def stream_turn(game_store, record, state, data, agent_kind):
+    """
+    Generator događaja poteza računara: "depth" nakon svake završene dubine iterativnog produbljivanja
+    (kolona, ocena, dubina, čvorovi), zatim "move" sa odigranim potezom.
+    Svaka dubina je poseban zadatak bez garancije da prethodne dubine dele transpozicionu tabelu, pa strim
+    pretraži i do trećine više čvorova od pretrage fiksne dubine u `play_turn`.
+    Kada klijent prekine vezu, server zatvara generator, a pretraga u toku se otkazuje.
+    """
+    task = None
+    try:
+        column, _ = cached_column(agent_kind, state, record, data)
+        if column is None:
+            column, _, task = pondered_column(agent_kind, state, record, data)
+        if task is not None:
+            # Pretraga odgovora je počela dok je čovek razmišljao
+            try:
+                column, elapsed_time, nodes, _ = yield from wait_depth(task, None)
+                log_search(record, agent_kind, elapsed_time, nodes, None)
+                remember_column(agent_kind, state, record, column)
+            except Timeout:
+                # Otkazana pretraga nema potez, pa se pretražuje iz početka
+                column = None
+        if column is None:
+            executor = get_search_executor()
+            start_time = time.perf_counter()
+            empty_cells = state.geometry.size - state.get_int_state().bit_count()
+            depth_limit = empty_cells if record.max_depth is None else min(record.max_depth, empty_cells)
+            deadline = start_time + record.time_ms / 1000 if record.time_ms is not None else None
+            nodes = 0
+            for depth in range(1, depth_limit + 1):
+                # Dubina 1 se uvek završava, da bi postojao potez
+                task = executor.submit_depth(agent_kind, state, depth, column)
+                result = yield from wait_depth(task, deadline if depth > 1 else None)
+                if result is None:
+                    task.cancel()
+                    break
+                column, value, source, _, depth_nodes = result
+                nodes += depth_nodes
+                if source != "search":
+                    break
+                yield sse_event("depth", {"depth": depth, "column": column, "score": value, "nodes": nodes})
+            log_search(record, agent_kind, time.perf_counter() - start_time, nodes, None)
+            remember_column(agent_kind, state, record, column)
+
+        state = state.generate_successor_state(column)
+        record.play(column, state)
+        game_store.save_move(record, column)
+        log_finished_game(state, record)
+        ponder(state, record, True)
+        yield sse_event("move", {"column": column, **turn_payload(state, record, data)})
+
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+    finally:
+        if task is not None and not task.done():
+            task.cancel()
+
+def read_position(position, geometry):
+    """
+    Čita poziciju za analizu: niz poteza (lista kolona ili kompaktan niz znakova) ili rečnik sa bitbordama
+    "red" i "yellow". Igrač na potezu sledi iz broja žetona; baca `ValueError` za nevalidnu poziciju.
+    """
+    if not isinstance(position, dict):
+        moves = decode_moves(position) if isinstance(position, str) else position
+        state = State(geometry)
+        for move in moves:
+            state = state.generate_successor_state(int(move))
+        return state
+
+    checkers_red, checkers_yellow = int(position.get("red", 0)), int(position.get("yellow", 0))
+    if checkers_red < 0 or checkers_yellow < 0 or checkers_red & checkers_yellow or \
+            (checkers_red | checkers_yellow) & ~geometry.draw_mask:
+        raise ValueError("Invalid bitboards.")
+    occupied = checkers_red | checkers_yellow
+    for col in range(geometry.cols):
+        # Žetoni kolone moraju biti složeni od dna, bez praznina
+        column = (occupied >> (col * geometry.rows)) & geometry.column_mask
+        if column & (column + 1):
+            raise ValueError(f"Floating checker in column {col}.")
+    red_count, yellow_count = checkers_red.bit_count(), checkers_yellow.bit_count()
+    if red_count - yellow_count not in (0, 1):
+        raise ValueError("Invalid number of checkers.")
+    next_on_move = State.RED if red_count == yellow_count else State.YEL
+    if int(position.get("next_on_move", next_on_move)) != next_on_move:
+        raise ValueError("Invalid player on move.")
+    return State.from_bitboards(checkers_red, checkers_yellow, next_on_move, geometry)
+
+def analysis_result(state, result):
+    """
+    Rezultat analize jedne pozicije; završene pozicije imaju samo status.
+    """
+    status = state.get_state_status()
+    if status is not None:
+        message = {State.RED: "Red wins!", State.YEL: "Yellow wins!", State.DRAW: "Draw!"}[status]
+        return {"message": message, "scores": None, "best_column": None}
+    scores, best_column, depth, elapsed_time, nodes = result
+    return {"scores": {str(col): score for col, score in scores.items()}, "best_column": best_column,
+            "depth": depth, "nodes": nodes, "elapsed_ms": round(elapsed_time * 1000, 3)}
+
 @csrf_exempt
 def start_game(request):
     """
@@ -22,40 +350,17 @@ def start_game(request):
     if request.method == "POST":
         try:
             data = json.loads(request.body)
-            # Preuzmi postavke iz zahteva
-            player_red = data.get("player_red", "human")
-            player_yellow = data.get("player_yellow", "human")
-            max_depth = int(data.get("max_depth", 4))
-            moves = data.get("moves", [])
-
-            # Kreiraj početno stanje igre
-            state = State()
-            for move in moves:
-                state = state.generate_successor_state(move)
-
-            # Kreiraj agente
-            agents = {
-                "minimax": MinimaxABAgent(),
-                "negascout": NegascoutAgent(),
-                "competitive": CompetitiveAgent(),
-                "human": None
-            }
-            red_agent = agents.get(player_red, None)
-            yellow_agent = agents.get(player_yellow, None)
-
-            # Proveri da li su agenti validni
-            if red_agent is None and player_red != "human":
-                return JsonResponse({"error": "Invalid agent for Red player."}, status=400)
-            if yellow_agent is None and player_yellow != "human":
-                return JsonResponse({"error": "Invalid agent for Yellow player."}, status=400)
-
-            # Čuvaj podatke u sesiji
-            request.session["state"] = state.to_dict()
-            request.session["red_agent"] = player_red
-            request.session["yellow_agent"] = player_yellow
-            request.session["max_depth"] = max_depth
-
-            return JsonResponse({"message": "Game started successfully!", "state": state.to_dict()}, status=200)
+            try:
+                state, record = read_game_settings(data)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+            # Igra se čuva u skladištu igara, a u sesiji samo njen identifikator
+            get_game_store().create(record)
+            request.session["game_id"] = record.game_id
+
+            return JsonResponse({"message": "Game started successfully!", "game_id": record.game_id,
+                                 "state": state_payload(state, record, data)}, status=200)
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
@@ -72,48 +377,255 @@ def play_turn(request):
             data = json.loads(request.body)
             column = data.get("column", None)
 
-            # Preuzmi stanje iz sesije
-            state_data = request.session.get("state")
-            player_red = request.session.get("red_agent")
-            player_yellow = request.session.get("yellow_agent")
-            max_depth = request.session.get("max_depth", 4)
+            # Preuzmi igru iz skladišta; klijent može poslati game_id i tako izbeći čitanje sesije
+            game_store = get_game_store()
+            record = game_store.load(data.get("game_id") or request.session.get("game_id"))
+            if record is None:
+                return JsonResponse({"error": "Game not found."}, status=400)
 
             # Rekonstruiši stanje
-            state = State.from_dict(state_data)
+            state = record.get_state()
 
             if state.get_state_status() is not None:
                 return JsonResponse({"error": "Game is already finished."}, status=400)
 
             # Odigraj potez
+            stats = None
+            computer_moved = column is None
             if column is None:
-                current_agent = None
-                if state.get_next_on_move() == State.RED:
-                    current_agent = CompetitiveAgent() if player_red == "competitive" else None
-                else:
-                    current_agent = CompetitiveAgent() if player_yellow == "competitive" else None
-
-                if current_agent:
-                    column = current_agent.get_chosen_column(state, max_depth)
+                agent_kind = get_turn_agent(state, record)
+                if agent_kind:
+                    # Pogodak u kešu preskače pretragu
+                    column, stats = cached_column(agent_kind, state, record, data)
+                if agent_kind and column is None:
+                    column, stats, task = pondered_column(agent_kind, state, record, data)
+                    if task is not None:
+                        # Pretraga odgovora je počela dok je čovek razmišljao
+                        try:
+                            column, elapsed_time, nodes, stats = task.result(search_timeout(record))
+                            log_search(record, agent_kind, elapsed_time, nodes, stats)
+                            remember_column(agent_kind, state, record, column)
+                        except TimeoutError:
+                            task.cancel()
+                            raise
+                        except Timeout:
+                            column = None
+                if agent_kind and column is None:
+                    # Pretraga se izvršava u zagrejanom radnom procesu
+                    column, elapsed_time, nodes, stats = get_search_executor().run(
+                        agent_kind, state, record.max_depth, record.time_ms, timeout=search_timeout(record),
+                        collect_stats=collect_stats(data))
+                    log_search(record, agent_kind, elapsed_time, nodes, stats)
+                    remember_column(agent_kind, state, record, column)
 
             if column is not None:
                 state = state.generate_successor_state(column)
-
-            # Ažuriraj stanje
-            request.session["state"] = state.to_dict()
+                # Ažuriraj stanje, upisuje se samo promena
+                record.play(column, state)
+                game_store.save_move(record, column)
+                log_finished_game(state, record)
+                ponder(state, record, computer_moved)
 
             # Proveri pobednika
-            status = state.get_state_status()
-            if status == State.RED:
-                return JsonResponse({"message": "Red wins!", "state": state.to_dict()}, status=200)
-            elif status == State.YEL:
-                return JsonResponse({"message": "Yellow wins!", "state": state.to_dict()}, status=200)
-            elif status == State.DRAW:
-                return JsonResponse({"message": "Draw!", "state": state.to_dict()}, status=200)
+            return turn_response(state, record, data, stats)
+
+        except (Timeout, TimeoutError, BrokenProcessPool) as e:
+            return search_failed_response(e)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"error": "Invalid request method."}, status=405)
+
+def play_turn_stream(request):
+    """
+    Endpoint za potez računara sa napretkom pretrage kao server-sent events (EventSource šalje GET).
+    Klijent dobija najbolji potez svake završene dubine odmah, a potez se upisuje na kraju pretrage.
+    """
+    if request.method == "GET":
+        try:
+            data = request.GET
+            game_store = get_game_store()
+            record = game_store.load(data.get("game_id") or request.session.get("game_id"))
+            if record is None:
+                return JsonResponse({"error": "Game not found."}, status=400)
+
+            state = record.get_state()
+
+            if state.get_state_status() is not None:
+                return JsonResponse({"error": "Game is already finished."}, status=400)
+
+            agent_kind = get_turn_agent(state, record)
+            if agent_kind is None:
+                return JsonResponse({"error": "Computer is not on move."}, status=400)
+
+            response = StreamingHttpResponse(stream_turn(game_store, record, state, data, agent_kind),
+                                             content_type="text/event-stream")
+            # Posrednici ne smeju da baferuju ni keširaju događaje
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"
+            return response
 
-            return JsonResponse({"message": "Move played.", "state": state.to_dict()}, status=200)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"error": "Invalid request method."}, status=405)
+
+@csrf_exempt
+def analyze(request):
+    """
+    Endpoint za analizu paketa pozicija.
+    Za svaku poziciju vraća ocene svih kolona i najbolju kolonu. Pozicije se analiziraju paralelno u radnim
+    procesima, čije transpozicione tabele ostaju tople tokom paketa; iste pozicije se analiziraju jednom.
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            agent_kind = data.get("agent", "competitive")
+            if agent_kind not in AGENT_KINDS:
+                return JsonResponse({"error": f"Unknown agent kind {agent_kind}."}, status=400)
+            # Dubina i vreme se ograničavaju, jer se množe brojem pozicija
+            time_ms = data.get("time_ms")
+            time_ms = min(max(int(time_ms), 1), ANALYZE_MAX_TIME_MS) if time_ms is not None else None
+            max_depth = data.get("max_depth", 4 if time_ms is None else None)
+            max_depth = min(max(int(max_depth), 1), ANALYZE_MAX_DEPTH) if max_depth is not None else ANALYZE_MAX_DEPTH
+            positions = data.get("positions")
+            if not isinstance(positions, list) or not positions:
+                return JsonResponse({"error": "Positions must be a non-empty list."}, status=400)
+            if len(positions) > ANALYZE_MAX_POSITIONS:
+                return JsonResponse({"error": f"At most {ANALYZE_MAX_POSITIONS} positions can be analyzed."},
+                                    status=400)
+            try:
+                geometry = get_geometry(int(data.get("rows", M)), int(data.get("cols", N)),
+                                        int(data.get("win_count", WIN_CNT)))
+                states = [read_position(position, geometry) for position in positions]
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+            start_time = time.perf_counter()
+            deadline = start_time + ANALYZE_TIMEOUT_SEC
+            executor = get_search_executor()
+            tasks = {}
+            for state in states:
+                key = (state.checkers_red, state.checkers_yellow)
+                if state.get_state_status() is None and key not in tasks:
+                    tasks[key] = executor.submit_analysis(agent_kind, state, max_depth, time_ms)
+            try:
+                results = {key: task.result(max(deadline - time.perf_counter(), 0)) for key, task in tasks.items()}
+            except TimeoutError:
+                response = JsonResponse({"error": "Analysis did not finish in time."}, status=503)
+                response["Retry-After"] = str(SEARCH_RETRY_AFTER_SEC)
+                return response
+            finally:
+                for task in tasks.values():
+                    if not task.done():
+                        task.cancel()
+
+            search_logger.info(json.dumps({
+                "event": "analyze",
+                "agent": agent_kind,
+                "positions": len(states),
+                "searched": len(tasks),
+                "max_depth": max_depth,
+                "time_ms": time_ms,
+                "elapsed_ms": round((time.perf_counter() - start_time) * 1000, 3),
+                "nodes": sum(result[4] for result in results.values()),
+            }))
+            return JsonResponse({"results": [
+                analysis_result(state, results.get((state.checkers_red, state.checkers_yellow)))
+                for state in states]}, status=200)
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
 
     return JsonResponse({"error": "Invalid request method."}, status=405)
 
+@csrf_exempt
+async def start_game_async(request):
+    """
+    Asinhrona verzija `start_game` za ASGI servere.
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            try:
+                state, record = read_game_settings(data)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+            await sync_to_async(get_game_store().create)(record)
+            await request.session.aset("game_id", record.game_id)
+
+            return JsonResponse({"message": "Game started successfully!", "game_id": record.game_id,
+                                 "state": state_payload(state, record, data)}, status=200)
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"error": "Invalid request method."}, status=405)
+
+@csrf_exempt
+async def play_turn_async(request):
+    """
+    Asinhrona verzija `play_turn` za ASGI servere.
+    Pretraga računara se izvršava van petlje događaja, u ograničenom redu pretraga;
+    kada je red pun, vraća se 503 sa Retry-After, a potezi ljudi nikad ne čekaju na pretrage.
+    """
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            column = data.get("column", None)
+
+            game_store = get_game_store()
+            game_id = data.get("game_id") or await request.session.aget("game_id")
+            record = await sync_to_async(game_store.load)(game_id)
+            if record is None:
+                return JsonResponse({"error": "Game not found."}, status=400)
+
+            state = record.get_state()
+
+            if state.get_state_status() is not None:
+                return JsonResponse({"error": "Game is already finished."}, status=400)
+
+            stats = None
+            computer_moved = column is None
+            if column is None:
+                agent_kind = get_turn_agent(state, record)
+                if agent_kind:
+                    column, stats = await sync_to_async(cached_column)(agent_kind, state, record, data)
+                if agent_kind and column is None:
+                    column, stats, task = await sync_to_async(pondered_column)(agent_kind, state, record, data)
+                    if task is not None:
+                        try:
+                            column, elapsed_time, nodes, stats = await asyncio.wait_for(task.aresult(),
+                                                                                        search_timeout(record))
+                            log_search(record, agent_kind, elapsed_time, nodes, stats)
+                            await sync_to_async(remember_column)(agent_kind, state, record, column)
+                        except Timeout:
+                            column = None
+                if agent_kind and column is None:
+                    try:
+                        column, elapsed_time, nodes, stats = await get_search_queue().run(
+                            agent_kind, state, record.max_depth, record.time_ms, collect_stats=collect_stats(data),
+                            timeout=search_timeout(record))
+                    except SearchQueueFull:
+                        response = JsonResponse({"error": "Server is busy, try again later."}, status=503)
+                        response["Retry-After"] = str(SEARCH_RETRY_AFTER_SEC)
+                        return response
+                    log_search(record, agent_kind, elapsed_time, nodes, stats)
+                    await sync_to_async(remember_column)(agent_kind, state, record, column)
+
+            if column is not None:
+                state = state.generate_successor_state(column)
+                record.play(column, state)
+                await sync_to_async(game_store.save_move)(record, column)
+                log_finished_game(state, record)
+                ponder(state, record, computer_moved)
+
+            return turn_response(state, record, data, stats)
+
+        except (Timeout, TimeoutError, BrokenProcessPool) as e:
+            return search_failed_response(e)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({"error": "Invalid request method."}, status=405)
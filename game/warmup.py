@@ -0,0 +1,60 @@
+import json
+import logging
+import time
+
+from game.agents.agents import Agent
+from game.agents.book import get_opening_book
+from game.models.config import WARMUP_DEPTH
+from game.models.geometry import DEFAULT_GEOMETRY
+from game.models.state import State
+from game.models.store import decode_moves
+
+# Cached geometry tables used by the agents and the move validation
+GEOMETRY_TABLES = ("directions", "win_shifts", "threat_shifts", "win_masks", "cell_masks", "center_order",
+                   "center_rank")
+
+# An opening, a midgame and an endgame position, so the book, the search and the solver all run
+WARMUP_POSITIONS = ("3342", "41565323454124", "21060023514500530321443662")
+
+logger = logging.getLogger("game.warmup")
+
+
+def build_tables(geometry):
+    """
+    Builds the cached tables of the geometry and the column tuples of every pattern of free top cells.
+    """
+    for name in GEOMETRY_TABLES:
+        getattr(geometry, name)
+    top_cells = [geometry.top_mask << (col * geometry.rows) for col in range(geometry.cols)]
+    for pattern in range(1 << geometry.cols):
+        geometry.get_free_columns(sum(cell for col, cell in enumerate(top_cells) if (pattern >> col) & 1))
+
+
+def warm_up(depth=WARMUP_DEPTH):
+    """
+    Builds the engine tables of the default board, maps the opening book and runs a short search of every
+    agent kind, so the first request does not pay for them. Called by gunicorn.conf.py before the server
+    forks its workers, the tables are shared by them copy-on-write.
+    Nothing here starts a thread or a process, since neither would survive the fork.
+    Returns the elapsed seconds.
+    """
+    from game.models.util import AGENT_CLASSES
+
+    start_time = time.perf_counter()
+    build_tables(DEFAULT_GEOMETRY)
+    get_opening_book()
+    if depth:
+        # The warm-up agents must not take the agent ids, which pick the default heuristics of later agents
+        ident = Agent.ident
+        try:
+            for moves in WARMUP_POSITIONS:
+                state = State()
+                for column in decode_moves(moves):
+                    state.play(column)
+                for agent_class in AGENT_CLASSES.values():
+                    agent_class(heuristic="hard").get_chosen_column(state, depth)
+        finally:
+            Agent.ident = ident
+    elapsed = time.perf_counter() - start_time
+    logger.info(json.dumps({"event": "warmup", "depth": depth, "elapsed_ms": round(elapsed * 1000, 3)}))
+    return elapsed
@@ -0,0 +1,18 @@
+import importlib
+
+import django
+from django.apps import apps
+
+
+def init_process(initializer=None, *args):
+    """
+    Initializer of the process pools: sets Django up, then calls the initializer given as "module.function".
+    Under the spawn and forkserver start methods a worker starts as a fresh interpreter, and the engine modules
+    live in the game.models package, whose import needs the app registry. So this module imports nothing
+    from the game package and the initializer is imported by name only after the setup.
+    """
+    if not apps.ready:
+        django.setup()
+    if initializer is not None:
+        module, name = initializer.rsplit(".", 1)
+        getattr(importlib.import_module(module), name)(*args)
@@ -0,0 +1,18 @@
+import gc
+
+# The app is loaded once in the master and warmed up in `when_ready`,
+# the workers share its memory pages copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the workers are forked; manage.py commands,
+    # tests and the search processes set Django up without paying for the warm-up
+    from game.warmup import warm_up
+    warm_up()
+
+
+def pre_fork(server, worker):
+    # Objects loaded in the master are left out of garbage collection, so the collector
+    # in a worker does not write to (and copy) their pages
+    gc.freeze()